@@ -1,38 +1,99 @@
 from __future__ import annotations
 
 import time
-from typing import Dict, List
+from typing import Awaitable, Callable, Dict, List, Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from config import MAX_AI_HISTORY, AI_COOLDOWN_SECONDS
-from db import get_guild_config
+from config import MAX_AI_HISTORY, AI_COOLDOWN_SECONDS, AI_HISTORY_TOKEN_BUDGET
+from db import get_guild_config, load_ai_history, save_ai_history
+from utils.ai_client import trim_history
+from utils.bounded_state import ExpiringMap
 from utils.guards import bot_ratio_exceeded, module_enabled
+from utils.message_pipeline import AI_STAGE, MessageContext
+
+MESSAGE_LIMIT = 1900
+STREAM_EDIT_INTERVAL = 1.2
+HISTORY_TTL = 3600.0
+HISTORY_CACHE_ENTRIES = 5000
 
 
 class AICog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.history: Dict[int, Dict[int, List[Dict[str, str]]]] = {}
-        self.cooldowns: Dict[int, float] = {}
+        self.history: ExpiringMap[List[Dict[str, str]]] = ExpiringMap(
+            "ai.history", HISTORY_TTL, HISTORY_CACHE_ENTRIES
+        )
+        self.cooldowns: ExpiringMap[float] = ExpiringMap("ai.cooldowns", AI_COOLDOWN_SECONDS)
+
+    async def cog_load(self) -> None:
+        self.bot.message_pipeline.add_stage("ai", AI_STAGE, self._reply_in_ai_channel)
+
+    async def cog_unload(self) -> None:
+        self.bot.message_pipeline.remove_stage("ai")
 
-    def _get_history(self, guild_id: int, user_id: int) -> List[Dict[str, str]]:
-        if guild_id not in self.history:
-            self.history[guild_id] = {}
-        if user_id not in self.history[guild_id]:
-            self.history[guild_id][user_id] = []
-        return self.history[guild_id][user_id]
+    async def _get_history(self, guild_id: int, user_id: int) -> List[Dict[str, str]]:
+        history = self.history.get((guild_id, user_id))
+        if history is None:
+            history = await load_ai_history(guild_id, user_id)
+            self.history.set((guild_id, user_id), history)
+        return history
+
+    def _remember(self, history: List[Dict[str, str]], role: str, content: str) -> None:
+        history.append({"role": role, "content": content})
+        trim_history(history, MAX_AI_HISTORY, AI_HISTORY_TOKEN_BUDGET)
 
     def _cooldown_ok(self, user_id: int) -> bool:
-        now = time.time()
-        last = self.cooldowns.get(user_id, 0)
-        if now - last < AI_COOLDOWN_SECONDS:
+        now = time.monotonic()
+        last = self.cooldowns.get(user_id)
+        if last is not None and now - last < AI_COOLDOWN_SECONDS:
             return False
-        self.cooldowns[user_id] = now
+        self.cooldowns.set(user_id, now)
         return True
 
+    async def _stream_reply(
+        self,
+        history: List[Dict[str, str]],
+        user_id: int,
+        guild_id: int,
+        send: Callable[[str], Awaitable[discord.Message]],
+    ) -> str:
+        reply = ""
+        pending = ""
+        shown = ""
+        message: Optional[discord.Message] = None
+        last_edit = 0.0
+        async for delta in self.bot.ai_client.stream(history, user_id, guild_id):
+            reply += delta
+            pending += delta
+            while len(pending) > MESSAGE_LIMIT:
+                chunk, pending = pending[:MESSAGE_LIMIT], pending[MESSAGE_LIMIT:]
+                if message is None:
+                    await send(chunk)
+                else:
+                    await message.edit(content=chunk)
+                message = None
+                shown = ""
+            if not pending.strip() or pending == shown:
+                continue
+            now = time.monotonic()
+            if message is None:
+                message = await send(pending)
+            elif now - last_edit >= STREAM_EDIT_INTERVAL:
+                await message.edit(content=pending)
+            else:
+                continue
+            shown = pending
+            last_edit = now
+        if pending.strip() and pending != shown:
+            if message is None:
+                await send(pending)
+            else:
+                await message.edit(content=pending)
+        return reply.strip()
+
     @app_commands.command(name="ai", description="Chat with Kasane Teto.")
     async def ai(self, interaction: discord.Interaction, prompt: str) -> None:
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
@@ -50,28 +111,24 @@ class AICog(commands.Cog):
         if not self._cooldown_ok(interaction.user.id):
             await interaction.response.send_message("Please wait before using AI again.", ephemeral=True)
             return
-        history = self._get_history(interaction.guild.id, interaction.user.id)
-        history.append({"role": "user", "content": prompt})
-        history[:] = history[-MAX_AI_HISTORY:]
+        history = await self._get_history(interaction.guild.id, interaction.user.id)
+        self._remember(history, "user", prompt)
         await interaction.response.defer()
+
+        async def send(content: str) -> discord.Message:
+            return await interaction.followup.send(content, wait=True)
+
         try:
-            reply = await self.bot.ai_client.generate(history, interaction.user.id)
+            reply = await self._stream_reply(history, interaction.user.id, interaction.guild.id, send)
         except Exception as exc:
             await interaction.followup.send(f"AI error: {exc}")
             return
-        history.append({"role": "assistant", "content": reply})
-        history[:] = history[-MAX_AI_HISTORY:]
-        if len(reply) <= 1900:
-            await interaction.followup.send(reply)
-        else:
-            for idx in range(0, len(reply), 1900):
-                await interaction.followup.send(reply[idx:idx + 1900])
-
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        if not message.guild or message.author.bot:
-            return
-        cfg = await get_guild_config(message.guild.id)
+        self._remember(history, "assistant", reply)
+        await save_ai_history(interaction.guild.id, interaction.user.id, history)
+
+    async def _reply_in_ai_channel(self, ctx: MessageContext) -> None:
+        message = ctx.message
+        cfg = ctx.config
         ai_channel_id = cfg.get("ai_channel_id")
         if not cfg.get("ai_enabled") or not ai_channel_id:
             return
@@ -83,20 +140,23 @@ class AICog(commands.Cog):
             return
         if not self._cooldown_ok(message.author.id):
             return
-        history = self._get_history(message.guild.id, message.author.id)
-        history.append({"role": "user", "content": message.content})
-        history[:] = history[-MAX_AI_HISTORY:]
+        history = await self._get_history(message.guild.id, message.author.id)
+        self._remember(history, "user", message.content)
+        replied = False
+
+        async def send(content: str) -> discord.Message:
+            nonlocal replied
+            if replied:
+                return await message.channel.send(content)
+            replied = True
+            return await message.reply(content, mention_author=False)
+
         try:
-            reply = await self.bot.ai_client.generate(history, message.author.id)
+            reply = await self._stream_reply(history, message.author.id, message.guild.id, send)
         except Exception:
             return
-        history.append({"role": "assistant", "content": reply})
-        history[:] = history[-MAX_AI_HISTORY:]
-        if len(reply) <= 1900:
-            await message.reply(reply, mention_author=False)
-        else:
-            for idx in range(0, len(reply), 1900):
-                await message.channel.send(reply[idx:idx + 1900])
+        self._remember(history, "assistant", reply)
+        await save_ai_history(message.guild.id, message.author.id, history)
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -14,9 +14,10 @@ from db import (
     get_balance,
     update_balance,
     get_daily_tasks,
-    upsert_daily_task,
+    ensure_daily_tasks,
+    DEFAULT_DAILY_TASKS,
     claim_daily,
-    add_user_item,
+    purchase_item,
     get_user_items,
     upsert_user_profile,
     get_user_profile,
@@ -58,12 +59,8 @@ class EconomyCog(commands.Cog):
         if not module_enabled(cfg, "economy_enabled", interaction.user.id):
             await interaction.response.send_message("Economy module is disabled.", ephemeral=True)
             return
+        await ensure_daily_tasks(interaction.guild.id, interaction.user.id, _date_str(), DEFAULT_DAILY_TASKS)
         tasks = await get_daily_tasks(interaction.guild.id, interaction.user.id, _date_str())
-        if not tasks:
-            await upsert_daily_task(interaction.guild.id, interaction.user.id, _date_str(), "messages", 30, 0, 0)
-            await upsert_daily_task(interaction.guild.id, interaction.user.id, _date_str(), "voice_minutes", 15, 0, 0)
-            await upsert_daily_task(interaction.guild.id, interaction.user.id, _date_str(), "games", 2, 0, 0)
-            tasks = await get_daily_tasks(interaction.guild.id, interaction.user.id, _date_str())
         all_done = all(t["progress"] >= t["target"] for t in tasks)
         already_claimed = all(t["claimed"] for t in tasks)
         if already_claimed:
@@ -73,7 +70,7 @@ class EconomyCog(commands.Cog):
             lines = [f"{t['task_type']}: {t['progress']}/{t['target']}" for t in tasks]
             await interaction.response.send_message("Tasks not complete:\n" + "\n".join(lines), ephemeral=True)
             return
-        await update_balance(interaction.guild.id, interaction.user.id, DAILY_REWARD)
+        await update_balance(interaction.guild.id, interaction.user.id, DAILY_REWARD, "daily")
         await claim_daily(interaction.guild.id, interaction.user.id, _date_str())
         await interaction.response.send_message(f"Daily reward claimed: {DAILY_REWARD} coins!", ephemeral=True)
 
@@ -100,12 +97,10 @@ class EconomyCog(commands.Cog):
             await interaction.response.send_message("Item not found.", ephemeral=True)
             return
         price = int(SHOP_ITEMS[item_id]["price"])
-        balance, _ = await get_balance(interaction.guild.id, interaction.user.id)
-        if balance < price:
+        balance = await purchase_item(interaction.guild.id, interaction.user.id, item_id, price)
+        if balance is None:
             await interaction.response.send_message("Not enough coins.", ephemeral=True)
             return
-        await update_balance(interaction.guild.id, interaction.user.id, -price)
-        await add_user_item(interaction.guild.id, interaction.user.id, item_id, 1)
         await interaction.response.send_message(f"Purchased {SHOP_ITEMS[item_id]['name']}.", ephemeral=True)
 
     @app_commands.command(name="inventory", description="Show your items.")
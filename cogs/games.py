@@ -14,8 +14,8 @@ from db import (
     update_balance,
     get_guild_config,
     update_daily_progress,
-    get_daily_tasks,
-    upsert_daily_task,
+    ensure_daily_tasks,
+    DEFAULT_DAILY_TASKS,
 )
 from utils.guards import bot_ratio_exceeded, module_enabled
 
@@ -40,12 +40,7 @@ class GamesCog(commands.Cog):
 
     async def _ensure_daily_tasks(self, guild_id: int, user_id: int) -> None:
         date = datetime.utcnow().strftime("%Y-%m-%d")
-        tasks = await get_daily_tasks(guild_id, user_id, date)
-        if tasks:
-            return
-        await upsert_daily_task(guild_id, user_id, date, "messages", 30, 0, 0)
-        await upsert_daily_task(guild_id, user_id, date, "voice_minutes", 15, 0, 0)
-        await upsert_daily_task(guild_id, user_id, date, "games", 2, 0, 0)
+        await ensure_daily_tasks(guild_id, user_id, date, DEFAULT_DAILY_TASKS)
 
     async def _module_ok(self, interaction: discord.Interaction) -> bool:
         if not interaction.guild:
@@ -66,7 +61,7 @@ class GamesCog(commands.Cog):
         await self._ensure_daily_tasks(interaction.guild.id, interaction.user.id)
         item = random.choice(FISH_ITEMS)
         await add_inventory_item(interaction.guild.id, interaction.user.id, item, 1)
-        await update_balance(interaction.guild.id, interaction.user.id, FISH_REWARD)
+        await update_balance(interaction.guild.id, interaction.user.id, FISH_REWARD, "fish")
         await update_daily_progress(interaction.guild.id, interaction.user.id, datetime.utcnow().strftime("%Y-%m-%d"), "games", 1)
         await interaction.response.send_message(f"You caught **{item}** and earned {FISH_REWARD} coins!", ephemeral=True)
 
@@ -77,7 +72,7 @@ class GamesCog(commands.Cog):
         await self._ensure_daily_tasks(interaction.guild.id, interaction.user.id)
         poke = random.choice(POKEMON_LIST)
         await add_pokemon(interaction.guild.id, interaction.user.id, poke, 1)
-        await update_balance(interaction.guild.id, interaction.user.id, POKEMON_REWARD)
+        await update_balance(interaction.guild.id, interaction.user.id, POKEMON_REWARD, "pokemon")
         await update_daily_progress(interaction.guild.id, interaction.user.id, datetime.utcnow().strftime("%Y-%m-%d"), "games", 1)
         await interaction.response.send_message(f"You caught **{poke}** and earned {POKEMON_REWARD} coins!", ephemeral=True)
 
@@ -97,7 +92,7 @@ class GamesCog(commands.Cog):
             await interaction.followup.send(f"Time's up! Answer: **{answer}**")
             return
         if msg.content.strip().lower() == answer.lower():
-            await update_balance(interaction.guild.id, interaction.user.id, 50)
+            await update_balance(interaction.guild.id, interaction.user.id, 50, "quiz")
             await interaction.followup.send("Correct! +50 coins.")
         else:
             await interaction.followup.send(f"Wrong! Answer: **{answer}**")
@@ -117,7 +112,7 @@ class GamesCog(commands.Cog):
         except Exception:
             await interaction.followup.send("No win this time!")
             return
-        await update_balance(interaction.guild.id, interaction.user.id, 40)
+        await update_balance(interaction.guild.id, interaction.user.id, 40, "typing")
         await interaction.followup.send("Nice typing! +40 coins.")
 
 
@@ -6,15 +6,15 @@ from typing import List, Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 from db import (
     get_guild_config,
     create_giveaway,
     get_giveaway,
     get_giveaway_by_message,
-    list_due_giveaways,
     list_open_giveaways,
+    list_giveaway_schedule,
     add_giveaway_entry,
     list_giveaway_entries,
     close_giveaway,
@@ -111,22 +111,24 @@ class GiveawayJoinView(discord.ui.View):
 class GiveawayCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.check_loop.start()
 
     async def cog_load(self) -> None:
         self.bot.add_view(GiveawayJoinView(self.bot))
+        self.bot.scheduler.register("giveaway", self._fire_giveaway)
+        for giveaway_id, ends_at in await list_giveaway_schedule():
+            self.bot.scheduler.schedule("giveaway", giveaway_id, ends_at)
 
     async def cog_unload(self) -> None:
-        self.check_loop.cancel()
+        self.bot.scheduler.unregister("giveaway")
 
-    @tasks.loop(seconds=30)
-    async def check_loop(self) -> None:
-        now_iso = datetime.now(timezone.utc).isoformat()
-        due = await list_due_giveaways(now_iso)
-        for giveaway in due:
-            await self._end_giveaway(giveaway)
+    async def _fire_giveaway(self, giveaway_id: int) -> None:
+        giveaway = await get_giveaway(giveaway_id)
+        if not giveaway or giveaway.get("ended_at"):
+            return
+        await self._end_giveaway(giveaway)
 
     async def _end_giveaway(self, giveaway: dict) -> None:
+        self.bot.scheduler.cancel("giveaway", giveaway["id"])
         guild = self.bot.get_guild(int(giveaway["guild_id"]))
         if not guild:
             await close_giveaway(giveaway["id"], [], datetime.now(timezone.utc).isoformat())
@@ -214,6 +216,7 @@ class GiveawayCog(commands.Cog):
             ends_at.isoformat(),
             interaction.user.id,
         )
+        self.bot.scheduler.schedule("giveaway", giveaway_id, ends_at)
         giveaway = {
             "id": giveaway_id,
             "guild_id": interaction.guild.id,
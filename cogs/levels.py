@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import random
+import time
 from datetime import datetime, timezone
 from typing import Dict
 
@@ -12,18 +13,24 @@ from config import XP_PER_MESSAGE_MIN, XP_PER_MESSAGE_MAX, XP_COOLDOWN_SECONDS,
 from db import (
     get_guild_config,
     get_leveling,
-    set_leveling,
+    add_leveling_xp,
+    flush_counters,
     get_leaderboard,
+    get_leaderboard_rank,
     increment_message_count,
     increment_voice_seconds,
     add_badge,
     get_badges,
-    get_daily_tasks,
-    upsert_daily_task,
+    ensure_daily_tasks,
     update_daily_progress,
 )
+from utils.bounded_state import ExpiringMap
 from utils.leveling_utils import level_from_xp, progress_to_next_level
 from utils.guards import bot_ratio_exceeded, module_enabled, is_owner
+from utils.message_pipeline import LEVELING_STAGE, MessageContext
+
+
+LEADERBOARD_PAGE_SIZE = 10
 
 
 def _date_str() -> str:
@@ -33,43 +40,42 @@ def _date_str() -> str:
 class LevelsCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.last_xp: Dict[int, Dict[int, float]] = {}
+        self.last_xp: ExpiringMap[float] = ExpiringMap("levels.xp_cooldowns", XP_COOLDOWN_SECONDS)
         self.voice_sessions: Dict[int, Dict[int, float]] = {}
 
+    async def cog_load(self) -> None:
+        self.bot.message_pipeline.add_stage("leveling", LEVELING_STAGE, self._award_message_xp)
+
+    async def cog_unload(self) -> None:
+        self.bot.message_pipeline.remove_stage("leveling")
+        await flush_counters()
+
     def _cooldown_ok(self, guild_id: int, user_id: int) -> bool:
-        if guild_id not in self.last_xp:
-            self.last_xp[guild_id] = {}
-        now = datetime.now(timezone.utc).timestamp()
-        last = self.last_xp[guild_id].get(user_id, 0.0)
-        if now - last < XP_COOLDOWN_SECONDS:
+        now = time.monotonic()
+        last = self.last_xp.get((guild_id, user_id))
+        if last is not None and now - last < XP_COOLDOWN_SECONDS:
             return False
-        self.last_xp[guild_id][user_id] = now
+        self.last_xp.set((guild_id, user_id), now)
         return True
 
     async def _ensure_daily_tasks(self, guild_id: int, user_id: int) -> None:
-        date = _date_str()
-        tasks = await get_daily_tasks(guild_id, user_id, date)
-        if tasks:
-            return
-        msg_target = random.randint(20, 50)
-        voice_target = random.randint(10, 30)
-        game_target = random.randint(1, 3)
-        await upsert_daily_task(guild_id, user_id, date, "messages", msg_target, 0, 0)
-        await upsert_daily_task(guild_id, user_id, date, "voice_minutes", voice_target, 0, 0)
-        await upsert_daily_task(guild_id, user_id, date, "games", game_target, 0, 0)
+        specs = (
+            ("messages", random.randint(20, 50)),
+            ("voice_minutes", random.randint(10, 30)),
+            ("games", random.randint(1, 3)),
+        )
+        await ensure_daily_tasks(guild_id, user_id, _date_str(), specs)
 
     async def _check_badges(self, guild_id: int, user_id: int, level: int) -> None:
         milestones = {5: "Rising Star", 10: "Teto Fan", 20: "Kasaner", 30: "Diva"} 
         if level in milestones:
             await add_badge(guild_id, user_id, milestones[level])
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        if not message.guild or message.author.bot:
-            return
-        if is_owner(message.author.id):
+    async def _award_message_xp(self, ctx: MessageContext) -> None:
+        if ctx.is_owner:
             return
-        cfg = await get_guild_config(message.guild.id)
+        message = ctx.message
+        cfg = ctx.config
         if not module_enabled(cfg, "leveling_enabled", message.author.id):
             return
         if bot_ratio_exceeded(message.guild, cfg, message.author.id):
@@ -83,7 +89,7 @@ class LevelsCog(commands.Cog):
         xp_gain = random.randint(XP_PER_MESSAGE_MIN, XP_PER_MESSAGE_MAX)
         new_xp = int(data["xp"]) + xp_gain
         new_level = level_from_xp(new_xp)
-        await set_leveling(message.guild.id, message.author.id, new_xp, new_level, datetime.now(timezone.utc).isoformat())
+        await add_leveling_xp(message.guild.id, message.author.id, xp_gain, new_level, datetime.now(timezone.utc).isoformat())
         if new_level > int(data["level"]):
             await self._check_badges(message.guild.id, message.author.id, new_level)
             try:
@@ -123,9 +129,9 @@ class LevelsCog(commands.Cog):
             minutes = max(1, seconds // 60)
             await update_daily_progress(guild_id, member.id, _date_str(), "voice_minutes", minutes)
             data = await get_leveling(guild_id, member.id)
-            new_xp = int(data["xp"]) + minutes * VOICE_XP_PER_MIN
-            new_level = level_from_xp(new_xp)
-            await set_leveling(guild_id, member.id, new_xp, new_level, datetime.now(timezone.utc).isoformat())
+            xp_gain = minutes * VOICE_XP_PER_MIN
+            new_level = level_from_xp(int(data["xp"]) + xp_gain)
+            await add_leveling_xp(guild_id, member.id, xp_gain, new_level, datetime.now(timezone.utc).isoformat())
         if before.channel is not None and after.channel is not None and before.channel != after.channel:
             start = self.voice_sessions[guild_id].get(member.id)
             if start:
@@ -142,25 +148,33 @@ class LevelsCog(commands.Cog):
         data = await get_leveling(interaction.guild.id, target.id)
         progress, required = progress_to_next_level(int(data["xp"]))
         badges = await get_badges(interaction.guild.id, target.id)
+        position, total = await get_leaderboard_rank(interaction.guild.id, target.id)
         embed = discord.Embed(title=f"{target.display_name}'s Rank", color=discord.Color.red())
+        embed.add_field(name="Rank", value=f"#{position} of {total}" if position else "Unranked", inline=True)
         embed.add_field(name="Level", value=str(data["level"]), inline=True)
         embed.add_field(name="XP", value=f"{data['xp']} ({progress}/{required})", inline=True)
         embed.add_field(name="Badges", value=", ".join(badges) if badges else "None", inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @app_commands.command(name="leaderboard", description="Show the XP leaderboard.")
-    async def leaderboard(self, interaction: discord.Interaction) -> None:
+    async def leaderboard(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1) -> None:
         if not interaction.guild:
             return
-        leaders = await get_leaderboard(interaction.guild.id, 10)
+        position, total = await get_leaderboard_rank(interaction.guild.id, interaction.user.id)
+        pages = max(1, -(-total // LEADERBOARD_PAGE_SIZE))
+        page = min(page, pages)
+        offset = (page - 1) * LEADERBOARD_PAGE_SIZE
+        leaders = await get_leaderboard(interaction.guild.id, LEADERBOARD_PAGE_SIZE, offset)
         lines = []
-        for idx, entry in enumerate(leaders, start=1):
+        for idx, entry in enumerate(leaders, start=offset + 1):
             user = interaction.guild.get_member(int(entry["user_id"]))
             name = user.display_name if user else str(entry["user_id"])
             lines.append(f"{idx}. {name} - L{entry['level']} ({entry['xp']} XP)")
         if not lines:
             await interaction.response.send_message("No data yet.", ephemeral=True)
             return
+        lines.append("")
+        lines.append(f"Page {page}/{pages}" + (f" | Your rank: #{position}" if position else ""))
         await interaction.response.send_message("\n".join(lines), ephemeral=True)
 
 
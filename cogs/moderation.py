@@ -1,9 +1,9 @@
 from __future__ import annotations
 
 import re
-from collections import defaultdict, deque
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Deque, Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import discord
 from discord import app_commands
@@ -18,23 +18,52 @@ from db import (
     add_blocked_word,
     remove_blocked_word,
     list_blocked_words,
+    get_blocked_words,
 )
 from utils.guards import bot_ratio_exceeded, is_owner
 from utils.checks import is_moderator
 from utils.logging_utils import send_log
+from utils.bounded_state import ExpiringMap, RepeatTracker, SlidingWindow
+from utils.message_pipeline import MODERATION_STAGE, MessageContext
+from utils.word_filter import WordMatcher
 
 
 INVITE_RE = re.compile(r"(discord\.gg/|discord\.com/invite/)", re.IGNORECASE)
 LINK_RE = re.compile(r"https?://", re.IGNORECASE)
 NSFW_WORDS = {"nsfw", "porn", "hentai", "sex", "nude"}
+SPAM_STATE_TTL = 600.0
+JOIN_STATE_TTL = 600.0
+
+
+class SpamState:
+    __slots__ = ("window", "repeats")
+
+    def __init__(self, limit: int) -> None:
+        self.window = SlidingWindow(limit)
+        self.repeats = RepeatTracker()
 
 
 class ModerationCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.message_timestamps: Dict[int, Dict[int, Deque[float]]] = defaultdict(lambda: defaultdict(deque))
-        self.message_content: Dict[int, Dict[int, Deque[str]]] = defaultdict(lambda: defaultdict(deque))
-        self.join_times: Dict[int, Deque[float]] = defaultdict(deque)
+        self.spam_state: ExpiringMap[SpamState] = ExpiringMap("moderation.spam", SPAM_STATE_TTL)
+        self.join_windows: ExpiringMap[SlidingWindow] = ExpiringMap("moderation.joins", JOIN_STATE_TTL)
+        self.word_matchers: Dict[int, Tuple[Tuple[str, ...], WordMatcher]] = {}
+
+    async def cog_load(self) -> None:
+        self.bot.message_pipeline.add_stage("moderation", MODERATION_STAGE, self._moderate_message)
+
+    async def cog_unload(self) -> None:
+        self.bot.message_pipeline.remove_stage("moderation")
+
+    async def _word_matcher(self, guild_id: int) -> WordMatcher:
+        words = await get_blocked_words(guild_id)
+        cached = self.word_matchers.get(guild_id)
+        if cached is not None and cached[0] is words:
+            return cached[1]
+        matcher = WordMatcher(words, NSFW_WORDS)
+        self.word_matchers[guild_id] = (words, matcher)
+        return matcher
 
     async def _can_moderate(self, interaction: discord.Interaction) -> bool:
         if not interaction.guild or not isinstance(interaction.user, discord.Member):
@@ -65,14 +94,15 @@ class ModerationCog(commands.Cog):
             await self._send_log_if_visible(member.guild.id, member.id, "Bot ratio guard: bots exceed humans.")
         if not cfg.get("anti_raid_enabled"):
             return
-        now = datetime.now(timezone.utc).timestamp()
-        bucket = self.join_times[member.guild.id]
-        bucket.append(now)
+        now = time.monotonic()
         window = int(cfg.get("anti_raid_window") or 10)
         threshold = int(cfg.get("anti_raid_threshold") or 6)
-        while bucket and now - bucket[0] > window:
-            bucket.popleft()
-        if len(bucket) >= threshold:
+        joins = self.join_windows.get(member.guild.id)
+        if joins is None or joins.limit != max(1, threshold):
+            joins = SlidingWindow(threshold)
+            self.join_windows.set(member.guild.id, joins)
+        joins.hit(now)
+        if joins.saturated(now, window):
             await self._timeout_member(member, 10, "Anti-raid protection")
             await self._send_log_if_visible(member.guild.id, member.id, f"Anti-raid: timed out {member.mention}")
 
@@ -84,24 +114,21 @@ class ModerationCog(commands.Cog):
         if bot_ratio_exceeded(member.guild, cfg):
             await self._send_log_if_visible(member.guild.id, member.id, "Bot ratio guard: bots exceed humans.")
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        if not message.guild or message.author.bot:
-            return
-        if is_owner(message.author.id):
-            return
-        cfg = await get_guild_config(message.guild.id)
+    async def _moderate_message(self, ctx: MessageContext) -> bool:
+        if ctx.is_owner:
+            return False
+        message = ctx.message
+        cfg = ctx.config
         if (
             not cfg.get("anti_spam_enabled")
             and not cfg.get("anti_invite_enabled")
             and not cfg.get("anti_link_enabled")
             and not cfg.get("anti_nsfw_enabled")
         ):
-            return
+            return False
 
-        if isinstance(message.author, discord.Member):
-            if await is_moderator(message.author):
-                return
+        if ctx.is_moderator:
+            return False
 
         max_mentions = int(cfg.get("max_mentions") or MAX_MENTIONS)
         if max_mentions > 0 and len(message.mentions) >= max_mentions:
@@ -111,20 +138,21 @@ class ModerationCog(commands.Cog):
                 pass
             await self._timeout_member(message.author, 5, "Mass mention spam")
             await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, "Mass mention spam")
-            return
+            return True
 
-        content_lower = (message.content or "").lower()
+        content_lower = ctx.content_lower
 
+        nsfw_hit = False
         if content_lower:
-            blocked = await list_blocked_words(message.guild.id)
-            for word in blocked:
-                if word in content_lower:
-                    try:
-                        await message.delete()
-                    except Exception:
-                        pass
-                    await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, f"Blocked word: {word}")
-                    return
+            matcher = await self._word_matcher(message.guild.id)
+            blocked_word, nsfw_hit = matcher.scan(content_lower)
+            if blocked_word is not None:
+                try:
+                    await message.delete()
+                except Exception:
+                    pass
+                await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, f"Blocked word: {blocked_word}")
+                return True
 
         if cfg.get("anti_invite_enabled") and INVITE_RE.search(content_lower):
             try:
@@ -132,7 +160,7 @@ class ModerationCog(commands.Cog):
             except Exception:
                 pass
             await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, "Invite link")
-            return
+            return True
 
         if cfg.get("anti_link_enabled") and LINK_RE.search(content_lower):
             try:
@@ -140,46 +168,45 @@ class ModerationCog(commands.Cog):
             except Exception:
                 pass
             await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, "Link not allowed")
-            return
+            return True
 
         if cfg.get("anti_nsfw_enabled") and isinstance(message.channel, discord.TextChannel) and not message.channel.is_nsfw():
-            if any(word in content_lower for word in NSFW_WORDS):
+            if nsfw_hit:
                 try:
                     await message.delete()
                 except Exception:
                     pass
                 await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, "NSFW content")
-                return
+                return True
 
         if cfg.get("anti_spam_enabled"):
-            now = datetime.now(timezone.utc).timestamp()
-            bucket = self.message_timestamps[message.guild.id][message.author.id]
-            bucket.append(now)
+            now = time.monotonic()
             interval = int(cfg.get("anti_spam_interval") or 8)
             rate = int(cfg.get("anti_spam_rate") or 6)
-            while bucket and now - bucket[0] > interval:
-                bucket.popleft()
-            if len(bucket) > rate:
+            key = (message.guild.id, message.author.id)
+            state = self.spam_state.get(key)
+            if state is None or state.window.limit != max(1, rate + 1):
+                state = SpamState(rate + 1)
+                self.spam_state.set(key, state)
+            state.window.hit(now)
+            if state.window.saturated(now, interval):
                 try:
                     await message.delete()
                 except Exception:
                     pass
                 await self._timeout_member(message.author, 5, "Spam detected")
                 await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, "Spam detected")
-                return
+                return True
 
-            content_bucket = self.message_content[message.guild.id][message.author.id]
-            content_bucket.append(content_lower)
-            while len(content_bucket) > 3:
-                content_bucket.popleft()
-            if len(content_bucket) == 3 and len(set(content_bucket)) == 1:
+            if state.repeats.hit(content_lower) >= 3:
                 try:
                     await message.delete()
                 except Exception:
                     pass
                 await self._timeout_member(message.author, 5, "Duplicate spam")
                 await add_warning(message.guild.id, message.author.id, self.bot.user.id if self.bot.user else 0, "Duplicate spam")
-                return
+                return True
+        return False
 
     @app_commands.command(name="warn", description="Warn a user.")
     async def warn(self, interaction: discord.Interaction, member: discord.Member, reason: Optional[str] = None) -> None:
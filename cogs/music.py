@@ -1,17 +1,54 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import inspect
 import logging
+import time
+import weakref
+from collections import deque
 from typing import List, Optional
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 import wavelink
 
-from config import LAVALINK_HOST, LAVALINK_PORT, LAVALINK_PASSWORD, LAVALINK_SECURE, MUSIC_MAX_QUEUE
-from db import get_guild_config
+from config import (
+    LAVALINK_HOST,
+    LAVALINK_PORT,
+    LAVALINK_PASSWORD,
+    LAVALINK_SECURE,
+    LAVALINK_NODES,
+    LAVALINK_CONNECT_RETRIES,
+    LAVALINK_STATS_INTERVAL_SECONDS,
+    LAVALINK_RESUME_TIMEOUT_SECONDS,
+    LAVALINK_FAILOVER_GRACE_SECONDS,
+    LAVALINK_SNAPSHOT_INTERVAL_SECONDS,
+    MUSIC_MAX_QUEUE,
+    MUSIC_PRELOAD_PERCENT,
+    MUSIC_SEARCH_CACHE_ENABLED,
+    MUSIC_SEARCH_CACHE_TTL_SECONDS,
+    MUSIC_SEARCH_CACHE_MAX_ENTRIES,
+    MUSIC_SEARCH_CACHE_MAX_BYTES,
+    MUSIC_SEARCH_PARALLEL,
+    MUSIC_SEARCH_SOURCE_TIMEOUT_SECONDS,
+    MUSIC_IDLE_CHECK_SECONDS,
+)
+from db import delete_music_queue, get_guild_config, load_music_queue, save_music_queue
 from utils.guards import bot_ratio_exceeded, module_enabled, is_owner
+from utils.lavalink_pool import NodeBalancer, PlayerSnapshot, parse_node_specs
+from utils.music_queue import QueueAdapter, extend_limited
+from utils.music_registry import PLAYERS, PlayerRecord
+from utils.music_search import SearchCache, SearchHit, SearchResult, normalize_search_query
+
+
+QUEUE_PAGE_SIZE = 10
+
+
+def _consume_task_result(task: asyncio.Task) -> None:
+    if not task.cancelled():
+        task.exception()
 
 
 def _clamp_text(value: str, size: int = 100) -> str:
@@ -31,6 +68,31 @@ def _format_track_length(length_ms: object) -> str:
     return f"{minutes}:{seconds:02d}"
 
 
+class TransitionStats:
+    __slots__ = ("count", "total_ms", "max_ms", "recent")
+
+    def __init__(self, window: int = 200) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def record(self, gap_ms: float) -> None:
+        self.count += 1
+        self.total_ms += gap_ms
+        self.max_ms = max(self.max_ms, gap_ms)
+        self.recent.append(gap_ms)
+
+    def summary(self) -> dict[str, float]:
+        recent = sorted(self.recent)
+        return {
+            "transitions": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else 0.0,
+            "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))], 1) if recent else 0.0,
+            "max_ms": round(self.max_ms, 1),
+        }
+
+
 class TrackPicker(discord.ui.Select):
     def __init__(self, view: "TrackPickerView") -> None:
         options: list[discord.SelectOption] = []
@@ -92,97 +154,395 @@ class MusicCog(commands.Cog):
         self.loop_enabled: dict[int, bool] = {}
         self.quality_warning_sent: set[int] = set()
         self.node_ready = False
+        self.node_specs = parse_node_specs(
+            LAVALINK_NODES,
+            f"{'https' if LAVALINK_SECURE else 'http'}://{LAVALINK_HOST}:{LAVALINK_PORT}",
+            LAVALINK_PASSWORD,
+        )
+        self.balancer = NodeBalancer()
+        self.connect_lock = asyncio.Lock()
+        self.orphaned: set[int] = set()
+        self.snapshots: dict[int, PlayerSnapshot] = {}
+        self.failovers: dict[str, asyncio.Task] = {}
+        self.queue_heads: dict[int, int] = {}
+        self.queue_adapters: weakref.WeakKeyDictionary[wavelink.Player, QueueAdapter] = weakref.WeakKeyDictionary()
+        self.restored: set[int] = set()
+        self.preloaded: dict[int, wavelink.Playable] = {}
+        self.preloading: set[int] = set()
+        self.track_ended_at: dict[int, float] = {}
+        self.last_gap_ms: dict[int, float] = {}
+        self.transitions = TransitionStats()
+        self.search_cache: Optional[SearchCache] = None
+        if MUSIC_SEARCH_CACHE_ENABLED:
+            self.search_cache = SearchCache(
+                MUSIC_SEARCH_CACHE_TTL_SECONDS,
+                MUSIC_SEARCH_CACHE_MAX_ENTRIES,
+                MUSIC_SEARCH_CACHE_MAX_BYTES,
+            )
 
     async def cog_load(self) -> None:
+        if self.search_cache is not None:
+            await self.search_cache.prune()
         await self._connect_lavalink()
+        self.node_stats_loop.start()
+        self.snapshot_loop.start()
+        self.idle_reaper_loop.start()
+
+    async def cog_unload(self) -> None:
+        self.node_stats_loop.cancel()
+        self.snapshot_loop.cancel()
+        self.idle_reaper_loop.cancel()
+        for task in self.failovers.values():
+            task.cancel()
+        self.failovers.clear()
 
     async def _connect_lavalink(self) -> None:
         if self.node_ready:
             return
-        uri = f"{'https' if LAVALINK_SECURE else 'http'}://{LAVALINK_HOST}:{LAVALINK_PORT}"
-        connected = False
-        if hasattr(wavelink, "Pool") and hasattr(wavelink, "Node"):
+        async with self.connect_lock:
+            if self.node_ready:
+                return
+            known = wavelink.Pool.nodes
+            pending = [
+                wavelink.Node(
+                    identifier=spec.identifier,
+                    uri=spec.uri,
+                    password=spec.password,
+                    retries=LAVALINK_CONNECT_RETRIES,
+                    resume_timeout=LAVALINK_RESUME_TIMEOUT_SECONDS,
+                    inactive_player_timeout=None,
+                )
+                for spec in self.node_specs
+                if spec.identifier not in known
+            ]
             try:
-                node = wavelink.Node(uri=uri, password=LAVALINK_PASSWORD)
-                await wavelink.Pool.connect(client=self.bot, nodes=[node])
-                connected = True
+                if pending:
+                    await wavelink.Pool.connect(client=self.bot, nodes=pending)
+                if len(pending) < len(self.node_specs):
+                    await wavelink.Pool.reconnect()
             except Exception as exc:
                 logging.exception("Lavalink pool connection failed: %s", exc)
-        if not connected and hasattr(wavelink, "NodePool"):
+            self.node_ready = self.balancer.best_node() is not None
+
+    @tasks.loop(seconds=LAVALINK_STATS_INTERVAL_SECONDS)
+    async def node_stats_loop(self) -> None:
+        if len(self.balancer.connected()) < len(wavelink.Pool.nodes):
             try:
-                await wavelink.NodePool.create_node(
-                    bot=self.bot,
-                    host=LAVALINK_HOST,
-                    port=LAVALINK_PORT,
-                    password=LAVALINK_PASSWORD,
-                    https=LAVALINK_SECURE,
-                )
-                connected = True
+                await wavelink.Pool.reconnect()
             except Exception as exc:
-                logging.exception("Lavalink node connection failed: %s", exc)
-        self.node_ready = connected
+                logging.warning("Lavalink reconnect failed: %s", exc)
+        await self.balancer.refresh()
+        self.node_ready = self.balancer.best_node() is not None
 
-    def _queue_size(self, player: wavelink.Player) -> int:
-        queue = getattr(player, "queue", None)
-        if queue is None:
-            return 0
-        try:
-            return len(queue)
-        except Exception:
-            count = getattr(queue, "count", None)
-            if isinstance(count, int):
-                return count
-        return 0
+    def _players_on_node(self, identifier: str) -> List[wavelink.Player]:
+        return [
+            client
+            for client in self.bot.voice_clients
+            if isinstance(client, wavelink.Player) and client.node.identifier == identifier
+        ]
 
-    def _queue_items(self, player: wavelink.Player) -> List[wavelink.Playable]:
-        queue = getattr(player, "queue", None)
-        if queue is None:
-            return []
-        try:
-            return list(queue)
-        except Exception:
-            inner = getattr(queue, "_queue", None)
-            if inner:
+    async def _migrate_players(self, players: List[wavelink.Player], dead: str) -> None:
+        for player in players:
+            guild = getattr(player, "guild", None)
+            if guild is None:
+                continue
+            target = await self.balancer.migrate(player, exclude=[dead])
+            if target is None:
+                self.orphaned.add(guild.id)
+                await self._save_queue(player, full=False)
+                continue
+            self.orphaned.discard(guild.id)
+            snapshot = self.snapshots.get(guild.id)
+            if snapshot is not None and not snapshot.live and snapshot.track == getattr(player, "current", None):
                 try:
-                    return list(inner)
-                except Exception:
-                    return []
-        return []
+                    await self._maybe_await(player.seek(snapshot.position))
+                except Exception as exc:
+                    logging.debug("Failed to restore position for player %s: %s", guild.id, exc)
+                self.snapshots[guild.id] = PlayerSnapshot(snapshot.track, snapshot.position, snapshot.paused)
+            logging.info("Moved music player %s from node %s to %s", guild.id, dead, target.identifier)
 
-    async def _queue_get(self, player: wavelink.Player) -> Optional[wavelink.Playable]:
-        queue = getattr(player, "queue", None)
-        if queue is None:
-            return None
-        getter = getattr(queue, "get", None)
-        if getter is None:
-            return None
-        queue_empty_type = getattr(getattr(wavelink, "exceptions", None), "QueueEmpty", None)
+    @tasks.loop(seconds=LAVALINK_SNAPSHOT_INTERVAL_SECONDS)
+    async def snapshot_loop(self) -> None:
+        for client in self.bot.voice_clients:
+            if not isinstance(client, wavelink.Player) or getattr(client, "current", None) is None:
+                continue
+            if client.node.status is not wavelink.NodeStatus.CONNECTED:
+                continue
+            self._snapshot(client)
+            await self._save_queue(client, full=False)
+
+    @tasks.loop(seconds=MUSIC_IDLE_CHECK_SECONDS)
+    async def idle_reaper_loop(self) -> None:
+        now = time.monotonic()
+        live: set[int] = set()
+        for client in list(self.bot.voice_clients):
+            if not isinstance(client, wavelink.Player):
+                continue
+            guild = getattr(client, "guild", None)
+            if guild is None:
+                continue
+            live.add(guild.id)
+            record = self._register_player(client)
+            reason = self._idle_reason(client)
+            idle_for = record.observe(reason, self._listener_count(client), now)
+            if reason is None or guild.id in self.orphaned:
+                continue
+            cfg = await get_guild_config(guild.id)
+            minutes = cfg.get("music_idle_minutes") or 0
+            if minutes <= 0 or idle_for < minutes * 60:
+                continue
+            await self._reap_player(client, reason)
+        for guild_id in PLAYERS.guild_ids() - live:
+            self._release_player(guild_id)
+
+    def _register_player(self, player: wavelink.Player) -> PlayerRecord:
+        channel = getattr(player, "channel", None)
+        node = getattr(player, "node", None)
+        return PLAYERS.register(player.guild.id, getattr(channel, "id", None), getattr(node, "identifier", None))
+
+    def _release_player(self, guild_id: int, reaped: bool = False) -> None:
+        PLAYERS.unregister(guild_id, reaped=reaped)
+        self.orphaned.discard(guild_id)
+        self.track_ended_at.pop(guild_id, None)
+        self.last_gap_ms.pop(guild_id, None)
+
+    def _listener_count(self, player: wavelink.Player) -> int:
+        channel = getattr(player, "channel", None)
+        members = getattr(channel, "members", None) or []
+        return sum(
+            1
+            for member in members
+            if not member.bot and not (member.voice and (member.voice.self_deaf or member.voice.deaf))
+        )
+
+    def _idle_reason(self, player: wavelink.Player) -> Optional[str]:
+        if self._listener_count(player) == 0:
+            return "alone"
+        if getattr(player, "current", None) is None and not self._is_playing(player) and not self._queue_size(player):
+            return "empty"
+        return None
+
+    async def _reap_player(self, player: wavelink.Player, reason: str, reaped: bool = True) -> None:
+        guild_id = player.guild.id
+        if getattr(player, "current", None) is not None or self._queue_size(player):
+            await self._save_queue(player)
+            self.restored.discard(guild_id)
+        else:
+            await self._forget_queue(guild_id)
         try:
-            result = getter()
+            await self._maybe_await(player.disconnect())
         except Exception as exc:
-            if queue_empty_type and isinstance(exc, queue_empty_type):
-                return None
-            return None
-        if inspect.isawaitable(result):
+            logging.warning("Failed to disconnect idle music player %s: %s", guild_id, exc)
+        self._release_player(guild_id, reaped=reaped)
+        logging.info("Disconnected music player in guild %s (%s)", guild_id, reason)
+
+    def _snapshot(self, player: wavelink.Player, position: Optional[int] = None) -> None:
+        guild = getattr(player, "guild", None)
+        if guild is None:
+            return
+        current = getattr(player, "current", None)
+        if current is None:
+            self.snapshots.pop(guild.id, None)
+            return
+        if position is None:
+            position = player.position
+        self.snapshots[guild.id] = PlayerSnapshot(current, position, self._is_paused(player))
+
+    @commands.Cog.listener()
+    async def on_wavelink_node_disconnected(self, payload: object) -> None:
+        node = getattr(payload, "node", None)
+        if node is None:
+            return
+        players = self._players_on_node(node.identifier)
+        for player in players:
+            snapshot = self.snapshots.get(player.guild.id) if player.guild else None
+            if snapshot is not None and snapshot.live:
+                self.snapshots[player.guild.id] = snapshot.freeze()
+        self.balancer.forget(node.identifier)
+        self.node_ready = self.balancer.best_node() is not None
+        if getattr(node, "session_id", None) is not None and node.status is wavelink.NodeStatus.CONNECTING:
+            if node.identifier not in self.failovers:
+                self.failovers[node.identifier] = asyncio.create_task(self._failover_later(node))
+            return
+        await self._migrate_players(players, node.identifier)
+
+    async def _failover_later(self, node: wavelink.Node) -> None:
+        try:
+            await asyncio.sleep(LAVALINK_FAILOVER_GRACE_SECONDS)
+            if node.status is wavelink.NodeStatus.CONNECTED:
+                return
+            logging.warning("Lavalink node %s did not resume in time, moving its players", node.identifier)
+            await self._migrate_players(self._players_on_node(node.identifier), node.identifier)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.exception("Failover for Lavalink node %s failed", node.identifier)
+        finally:
+            if self.failovers.get(node.identifier) is asyncio.current_task():
+                self.failovers.pop(node.identifier, None)
+
+    @commands.Cog.listener()
+    async def on_wavelink_node_ready(self, payload: object) -> None:
+        node = getattr(payload, "node", None)
+        if node is None:
+            return
+        self.node_ready = True
+        pending = self.failovers.pop(node.identifier, None)
+        if pending is not None:
+            pending.cancel()
+        resumed = bool(getattr(payload, "resumed", False))
+        local = self._players_on_node(node.identifier)
+        if resumed:
+            logging.info("Lavalink node %s resumed its session with %s players", node.identifier, len(local))
+            for player in local:
+                if player.guild is not None:
+                    self.orphaned.discard(player.guild.id)
+                    snapshot = self.snapshots.get(player.guild.id)
+                    if snapshot is not None and not snapshot.live:
+                        self.snapshots[player.guild.id] = PlayerSnapshot(snapshot.track, snapshot.position, snapshot.paused)
+            await self.balancer.prune_stale(node)
+        else:
+            for player in local:
+                if player.guild is None:
+                    continue
+                if not await self.balancer.reattach(player):
+                    logging.warning(
+                        "Could not reattach music player %s to node %s; its snapshot was not replayed",
+                        player.guild.id,
+                        node.identifier,
+                    )
+                    await self._reap_player(player, "reattach failed", reaped=False)
+                    continue
+                self.orphaned.discard(player.guild.id)
+                await self._replay_current(player)
+        if not self.orphaned:
+            return
+        stranded = [
+            client
+            for client in self.bot.voice_clients
+            if isinstance(client, wavelink.Player)
+            and client.guild is not None
+            and client.guild.id in self.orphaned
+            and client.node.identifier != node.identifier
+        ]
+        for player in stranded:
+            await self._migrate_players([player], player.node.identifier)
+
+    async def _replay_current(self, player: wavelink.Player) -> None:
+        guild = getattr(player, "guild", None)
+        if guild is None:
+            return
+        snapshot = self.snapshots.get(guild.id)
+        current = getattr(player, "current", None)
+        if snapshot is not None:
+            position = snapshot.position_now()
             try:
-                return await result
+                await self._maybe_await(player.play(snapshot.track, replace=True, start=position, paused=snapshot.paused))
             except Exception as exc:
-                if queue_empty_type and isinstance(exc, queue_empty_type):
-                    return None
-                return None
+                logging.warning(
+                    "Could not replay snapshot of %r at %s ms in guild %s: %s",
+                    getattr(snapshot.track, "title", snapshot.track),
+                    position,
+                    guild.id,
+                    exc,
+                )
+                self.snapshots.pop(guild.id, None)
+            else:
+                self.snapshots[guild.id] = PlayerSnapshot(snapshot.track, position, snapshot.paused)
+                return
+        if current is None:
+            next_track = await self._queue_get(player)
+            if next_track is not None:
+                await self._maybe_await(player.play(next_track))
+            return
+        state = await load_music_queue(guild.id)
+        start = state["position"] if state and state["current"] == getattr(current, "encoded", None) else 0
+        await self._maybe_await(player.play(current, replace=True, start=start))
+
+    def _queue(self, player: wavelink.Player) -> QueueAdapter:
+        queue = getattr(player, "queue", None)
+        adapter = self.queue_adapters.get(player)
+        if adapter is None or adapter.queue is not queue:
+            adapter = QueueAdapter(queue)
+            self.queue_adapters[player] = adapter
+        return adapter
+
+    def _queue_size(self, player: wavelink.Player) -> int:
+        return len(self._queue(player))
+
+    async def _queue_get(self, player: wavelink.Player) -> Optional[wavelink.Playable]:
+        result = await self._queue(player).get()
+        guild = getattr(player, "guild", None)
+        if result is not None and guild is not None:
+            self.queue_heads[guild.id] = self.queue_heads.get(guild.id, 0) + 1
         return result
 
     def _queue_put(self, player: wavelink.Player, track: wavelink.Playable) -> None:
-        queue = getattr(player, "queue", None)
-        if queue is None:
-            return
-        putter = getattr(queue, "put", None)
-        if putter:
-            putter(track)
+        self._queue(player).put(track)
+
+    async def _save_queue(self, player: wavelink.Player, full: bool = True) -> None:
+        guild = getattr(player, "guild", None)
+        if guild is None:
             return
-        put_nowait = getattr(queue, "put_nowait", None)
-        if put_nowait:
-            put_nowait(track)
+        tracks: Optional[List[str]] = None
+        if full:
+            tracks = self._queue(player).encoded()
+            self.queue_heads[guild.id] = 0
+        current = getattr(player, "current", None)
+        channel = getattr(player, "channel", None)
+        position = getattr(player, "position", 0) if current is not None else 0
+        await save_music_queue(
+            guild.id,
+            getattr(channel, "id", None),
+            tracks,
+            self.queue_heads.get(guild.id, 0),
+            getattr(current, "encoded", None),
+            position if isinstance(position, int) else 0,
+            1 if self.loop_enabled.get(guild.id) else 0,
+        )
+
+    async def _forget_queue(self, guild_id: int) -> None:
+        self.queue_heads.pop(guild_id, None)
+        self.preloaded.pop(guild_id, None)
+        self.snapshots.pop(guild_id, None)
+        await delete_music_queue(guild_id)
+
+    async def _decode_tracks(self, player: wavelink.Player, encoded: List[str]) -> List[wavelink.Playable]:
+        node = getattr(player, "node", None)
+        if node is None or not encoded:
+            return []
+        try:
+            payloads = await node.send("POST", path="v4/decodetracks", data=encoded)
+            return [wavelink.Playable(payload) for payload in payloads]
+        except Exception as exc:
+            logging.warning("Failed to decode %s stored tracks: %s", len(encoded), exc)
+            return []
+
+    async def _restore_queue(self, player: wavelink.Player) -> int:
+        guild = getattr(player, "guild", None)
+        if guild is None or guild.id in self.restored:
+            return 0
+        self.restored.add(guild.id)
+        if self._is_playing(player) or self._queue_size(player):
+            return 0
+        state = await load_music_queue(guild.id)
+        if not state:
+            return 0
+        if state["loop_mode"]:
+            self.loop_enabled[guild.id] = True
+        encoded = ([state["current"]] if state["current"] else []) + state["tracks"][:MUSIC_MAX_QUEUE]
+        tracks = await self._decode_tracks(player, encoded)
+        if len(tracks) != len(encoded):
+            return 0
+        current = tracks.pop(0) if state["current"] else None
+        self._queue(player).extend(tracks)
+        if current is None:
+            current = await self._queue_get(player)
+        if current is not None:
+            await self._maybe_await(player.play(current, start=state["position"] if state["current"] else 0))
+        await self._save_queue(player)
+        logging.info("Restored %s queued tracks for guild %s", len(encoded), guild.id)
+        return len(encoded)
 
     async def _maybe_await(self, value: object) -> None:
         if inspect.isawaitable(value):
@@ -279,15 +639,19 @@ class MusicCog(commands.Cog):
                 if mover:
                     await self._maybe_await(mover(voice_state.channel))
             await self._enforce_self_deaf(interaction.guild, existing.channel or voice_state.channel)
+            self._register_player(existing)
             return existing
+        node = self.balancer.best_node()
+        connector = functools.partial(wavelink.Player, nodes=[node]) if node is not None else wavelink.Player
         player = await voice_state.channel.connect(
-            cls=wavelink.Player,
+            cls=connector,
             self_deaf=True,
             self_mute=False,
         )
         if isinstance(player, wavelink.Player):
             self._disable_autoplay(player)
             await self._enforce_self_deaf(interaction.guild, player.channel)
+            self._register_player(player)
         return player
 
     async def _search(
@@ -354,48 +718,102 @@ class MusicCog(commands.Cog):
                     _append_attempt(normalized, "scsearch")
                 if not attempts:
                     _append_attempt(normalized, None)
+        cache = self.search_cache
+        cache_query = normalize_search_query(normalized, is_url)
+        if cache is not None:
+            for _, search_source in attempts:
+                cached = await cache.get(cache_query, search_source)
+                if cached is not None:
+                    return cached
+        if MUSIC_SEARCH_PARALLEL and len(attempts) > 1:
+            found, last_error = await self._search_parallel(attempts)
+        else:
+            found, last_error = await self._search_sequential(attempts)
+        if found is not None:
+            search_source, playlist, tracks = found
+            if cache is not None:
+                await cache.put(cache_query, search_source, playlist, tracks)
+            return playlist, tracks
+        if last_error is not None:
+            logging.exception("Search failed: %s", last_error)
+        return None, []
+
+    async def _search_sequential(
+        self,
+        attempts: list[tuple[str, object | None]],
+    ) -> tuple[Optional[SearchHit], Optional[Exception]]:
         last_error: Optional[Exception] = None
         for search_query, search_source in attempts:
             try:
-                if hasattr(wavelink, "Playable"):
-                    if search_source is None:
-                        results = await wavelink.Playable.search(search_query)
-                    else:
-                        results = await wavelink.Playable.search(search_query, source=search_source)
-                elif hasattr(wavelink, "YouTubeTrack"):
-                    results = await wavelink.YouTubeTrack.search(query=search_query)
-                else:
-                    results = []
+                playlist, tracks = await asyncio.wait_for(
+                    self._search_source(search_query, search_source),
+                    timeout=MUSIC_SEARCH_SOURCE_TIMEOUT_SECONDS,
+                )
             except Exception as exc:
                 last_error = exc
                 continue
-            if hasattr(wavelink, "Playlist") and isinstance(results, wavelink.Playlist):
-                tracks = list(results.tracks)
-                if tracks:
-                    return results, tracks
-                continue
-            if isinstance(results, list):
-                if results:
-                    return None, results
-                continue
-            try:
-                tracks = list(results)
-            except Exception:
-                tracks = []
             if tracks:
-                return None, tracks
-        if last_error is not None:
-            logging.exception("Search failed: %s", last_error)
-        return None, []
+                return (search_source, playlist, tracks), last_error
+        return None, last_error
+
+    async def _search_parallel(
+        self,
+        attempts: list[tuple[str, object | None]],
+    ) -> tuple[Optional[SearchHit], Optional[Exception]]:
+        tasks = [
+            asyncio.create_task(
+                asyncio.wait_for(
+                    self._search_source(search_query, search_source),
+                    timeout=MUSIC_SEARCH_SOURCE_TIMEOUT_SECONDS,
+                )
+            )
+            for search_query, search_source in attempts
+        ]
+        for task in tasks:
+            task.add_done_callback(_consume_task_result)
+        last_error: Optional[Exception] = None
+        try:
+            for task, (_, search_source) in zip(tasks, attempts):
+                try:
+                    playlist, tracks = await task
+                except Exception as exc:
+                    last_error = exc
+                    continue
+                if tracks:
+                    return (search_source, playlist, tracks), last_error
+            return None, last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _search_source(self, search_query: str, search_source: object | None) -> SearchResult:
+        if hasattr(wavelink, "Playable"):
+            if search_source is None:
+                results = await wavelink.Playable.search(search_query)
+            else:
+                results = await wavelink.Playable.search(search_query, source=search_source)
+        elif hasattr(wavelink, "YouTubeTrack"):
+            results = await wavelink.YouTubeTrack.search(query=search_query)
+        else:
+            results = []
+        if hasattr(wavelink, "Playlist") and isinstance(results, wavelink.Playlist):
+            return results, list(results.tracks)
+        if isinstance(results, list):
+            return None, results
+        try:
+            return None, list(results)
+        except Exception:
+            return None, []
 
     async def _queue_track(self, player: wavelink.Player, track: wavelink.Playable) -> None:
         self._disable_autoplay(player)
         self._queue_put(player, track)
-        if self._is_playing(player):
-            return
-        next_track = await self._queue_get(player)
-        if next_track:
-            await self._maybe_await(player.play(next_track))
+        if not self._is_playing(player):
+            next_track = await self._queue_get(player)
+            if next_track:
+                await self._maybe_await(player.play(next_track))
+        await self._save_queue(player)
 
     def _is_url_query(self, query: str) -> bool:
         lowered = query.strip().lower()
@@ -435,6 +853,8 @@ class MusicCog(commands.Cog):
             await interaction.followup.send("Failed to connect to voice.")
             return
         await self._maybe_warn_low_bitrate(interaction, player.channel if isinstance(player, wavelink.Player) else None)
+        if isinstance(player, wavelink.Player):
+            await self._restore_queue(player)
         playlist, tracks = await self._search(query, preferred_source=preferred_source)
         if not tracks:
             await interaction.followup.send("No results found.", ephemeral=True)
@@ -444,14 +864,12 @@ class MusicCog(commands.Cog):
             await interaction.followup.send("Queue is full.", ephemeral=True)
             return
         if playlist:
-            added = 0
-            for track in tracks[:available]:
-                self._queue_put(player, track)
-                added += 1
+            added = extend_limited(self._queue(player), tracks, available)
             if not self._is_playing(player):
                 next_track = await self._queue_get(player)
                 if next_track:
                     await self._maybe_await(player.play(next_track))
+            await self._save_queue(player)
             await interaction.followup.send(f"Queued playlist {playlist.name} with {added} tracks.")
             return
         if direct_only or self._is_url_query(query):
@@ -475,6 +893,9 @@ class MusicCog(commands.Cog):
         if not guild:
             return
         reason = str(getattr(payload, "reason", "") or "").lower()
+        if reason != "replaced":
+            self.track_ended_at[guild.id] = time.monotonic()
+        self.preloaded.pop(guild.id, None)
         if self.loop_enabled.get(guild.id) and track is not None:
             if reason == "loadfailed":
                 self.loop_enabled[guild.id] = False
@@ -483,9 +904,86 @@ class MusicCog(commands.Cog):
                 return
         next_track = await self._queue_get(player)
         if next_track is None:
+            self.track_ended_at.pop(guild.id, None)
+            await self._forget_queue(guild.id)
             return
         await self._maybe_await(player.play(next_track))
 
+    @commands.Cog.listener()
+    async def on_wavelink_track_start(self, payload: object) -> None:
+        player = getattr(payload, "player", None)
+        if not isinstance(player, wavelink.Player):
+            return
+        guild = getattr(player, "guild", None)
+        ended_at = self.track_ended_at.pop(guild.id, None) if guild is not None else None
+        if ended_at is not None:
+            gap_ms = (time.monotonic() - ended_at) * 1000
+            self.last_gap_ms[guild.id] = gap_ms
+            self.transitions.record(gap_ms)
+            logging.debug("Music transition gap in guild %s: %.0f ms", guild.id, gap_ms)
+        if guild is not None:
+            PLAYERS.track_started(guild.id)
+
+    @commands.Cog.listener()
+    async def on_wavelink_player_update(self, payload: object) -> None:
+        player = getattr(payload, "player", None)
+        if not isinstance(player, wavelink.Player):
+            return
+        position = getattr(payload, "position", 0)
+        self._snapshot(player, position)
+        if MUSIC_PRELOAD_PERCENT <= 0:
+            return
+        guild = getattr(player, "guild", None)
+        current = getattr(player, "current", None)
+        if guild is None or current is None or guild.id in self.preloaded or guild.id in self.preloading:
+            return
+        length = getattr(current, "length", 0)
+        if getattr(current, "is_stream", False) or not isinstance(length, int) or length <= 0:
+            return
+        if position * 100 < length * MUSIC_PRELOAD_PERCENT:
+            return
+        await self._preload_next(player)
+
+    async def _preload_next(self, player: wavelink.Player) -> None:
+        guild = player.guild
+        if guild is None:
+            return
+        self.preloading.add(guild.id)
+        try:
+            await self._preload_head(player, guild.id)
+        finally:
+            self.preloading.discard(guild.id)
+
+    async def _preload_head(self, player: wavelink.Player, guild_id: int) -> None:
+        queue = self._queue(player)
+        dropped = 0
+        while len(queue):
+            track = queue.head()
+            playable = await self._validate_track(player, track)
+            if queue.head() is not track:
+                break
+            if playable:
+                self.preloaded[guild_id] = track
+                break
+            logging.warning("Dropping unplayable queued track %r in guild %s", getattr(track, "title", track), guild_id)
+            queue.drop_head()
+            dropped += 1
+        if dropped:
+            await self._save_queue(player)
+
+    async def _validate_track(self, player: wavelink.Player, track: object) -> bool:
+        encoded = getattr(track, "encoded", None)
+        if not isinstance(track, wavelink.Playable) or not encoded:
+            return False
+        try:
+            await player.node.send("GET", path="v4/decodetrack", params={"encodedTrack": encoded})
+        except wavelink.LavalinkException as exc:
+            logging.debug("Queued track failed to decode: %s", exc)
+            return False
+        except Exception as exc:
+            logging.debug("Could not validate queued track ahead of time: %s", exc)
+        return True
+
     @commands.Cog.listener()
     async def on_wavelink_track_exception(self, payload: object) -> None:
         player = getattr(payload, "player", None)
@@ -606,14 +1104,11 @@ class MusicCog(commands.Cog):
             await interaction.response.send_message("Not connected.", ephemeral=True)
             return
         await self._maybe_await(player.stop())
-        queue = getattr(player, "queue", None)
-        if queue is not None:
-            clearer = getattr(queue, "clear", None)
-            if clearer:
-                clearer()
-            else:
-                for _ in range(self._queue_size(player)):
-                    _ = await self._queue_get(player)
+        queue = self._queue(player)
+        if not queue.clear():
+            for _ in range(len(queue)):
+                _ = await self._queue_get(player)
+        await self._forget_queue(interaction.guild.id)
         await interaction.response.send_message("Stopped and cleared queue.", ephemeral=True)
 
     @app_commands.command(name="leave", description="Disconnect from voice.")
@@ -625,21 +1120,32 @@ class MusicCog(commands.Cog):
             await interaction.response.send_message("Not connected.", ephemeral=True)
             return
         await self._maybe_await(player.disconnect())
+        await self._forget_queue(interaction.guild.id)
+        self._release_player(interaction.guild.id)
         await interaction.response.send_message("Disconnected.", ephemeral=True)
 
     @app_commands.command(name="queue", description="Show the queue.")
-    async def queue(self, interaction: discord.Interaction) -> None:
+    async def queue(self, interaction: discord.Interaction, page: app_commands.Range[int, 1] = 1) -> None:
         if not interaction.guild:
             return
         player = interaction.guild.voice_client
         if not isinstance(player, wavelink.Player):
             await interaction.response.send_message("Not connected.", ephemeral=True)
             return
-        items = self._queue_items(player)
-        if not items:
+        queue = self._queue(player)
+        total = len(queue)
+        if not total:
             await interaction.response.send_message("Queue is empty.", ephemeral=True)
             return
-        lines = [f"{idx + 1}. {track.title}" for idx, track in enumerate(items[:10])]
+        pages = max(1, -(-total // QUEUE_PAGE_SIZE))
+        page = min(page, pages)
+        offset = (page - 1) * QUEUE_PAGE_SIZE
+        lines = [
+            f"{idx}. {track.title}"
+            for idx, track in enumerate(queue.window(offset, QUEUE_PAGE_SIZE), start=offset + 1)
+        ]
+        lines.append("")
+        lines.append(f"Page {page}/{pages} | {total} tracks")
         await interaction.response.send_message("\n".join(lines), ephemeral=True)
 
     @app_commands.command(name="nowplaying", description="Show current song.")
@@ -654,7 +1160,11 @@ class MusicCog(commands.Cog):
         if not current:
             await interaction.response.send_message("Nothing is playing.", ephemeral=True)
             return
-        await interaction.response.send_message(f"Now playing: {current.title}", ephemeral=True)
+        message = f"Now playing: {current.title}"
+        gap_ms = self.last_gap_ms.get(interaction.guild.id)
+        if gap_ms is not None:
+            message += f"\nLast track change took {gap_ms:.0f} ms."
+        await interaction.response.send_message(message, ephemeral=True)
 
     @app_commands.command(name="loop", description="Toggle loop mode.")
     async def loop(self, interaction: discord.Interaction) -> None:
@@ -662,6 +1172,9 @@ class MusicCog(commands.Cog):
             return
         enabled = not self.loop_enabled.get(interaction.guild.id, False)
         self.loop_enabled[interaction.guild.id] = enabled
+        player = interaction.guild.voice_client
+        if isinstance(player, wavelink.Player):
+            await self._save_queue(player, full=False)
         await interaction.response.send_message(f"Loop is now {'on' if enabled else 'off'}.", ephemeral=True)
 
 
@@ -8,7 +8,9 @@ from discord import app_commands
 from discord.ext import commands
 
 from db import get_leveling, set_leveling, set_balance
+from utils.bounded_state import state_stats
 from utils.leveling_utils import level_from_xp, xp_for_level
+from utils.music_registry import player_stats
 from utils.superusers import is_primary_owner, add_superuser, remove_superuser, list_superusers
 
 
@@ -99,6 +101,24 @@ class OwnerAdminCog(commands.Cog):
                 lines.append(str(user_id))
         await interaction.response.send_message("Superusers:\n" + "\n".join(lines), ephemeral=True)
 
+    @app_commands.command(name="owner_stats", description="OWNER_ID only: show in-memory state occupancy.")
+    async def owner_stats(self, interaction: discord.Interaction) -> None:
+        if not await self._owner_only(interaction):
+            return
+        lines = [
+            f"{entry['name']}: {entry['size']}/{entry['max_entries']} "
+            f"(evicted {entry['evictions']}, expired {entry['expirations']})"
+            for entry in state_stats()
+        ]
+        players = player_stats()
+        nodes = ", ".join(f"{name}={count}" for name, count in sorted(players["nodes"].items()))
+        lines.append(
+            f"music.players: {players['active']} active, {players['idle']} idle, "
+            f"{players['listeners']} listeners (reaped {players['reaped']}, "
+            f"longest {int(players['longest_uptime'] // 60)} min) {nodes}".rstrip()
+        )
+        await interaction.response.send_message("\n".join(lines), ephemeral=True)
+
 
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(OwnerAdminCog(bot))
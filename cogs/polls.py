@@ -6,15 +6,15 @@ from typing import List
 
 import discord
 from discord import app_commands
-from discord.ext import commands, tasks
+from discord.ext import commands
 
 from db import (
     create_poll,
     get_poll,
     vote_poll,
     get_poll_counts,
-    list_due_polls,
     list_open_polls,
+    list_poll_schedule,
     delete_poll,
     get_guild_config,
 )
@@ -75,7 +75,6 @@ def render_poll_embed(question: str, options: List[str], counts: List[int], anon
 class PollsCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.poll_loop.start()
 
     async def cog_load(self) -> None:
         polls = await list_open_polls(_utcnow())
@@ -83,29 +82,32 @@ class PollsCog(commands.Cog):
             options = json.loads(poll["options_json"])
             view = PollView(poll["id"], options)
             self.bot.add_view(view)
+        self.bot.scheduler.register("poll", self._close_poll)
+        for poll_id, ends_at in await list_poll_schedule():
+            self.bot.scheduler.schedule("poll", poll_id, ends_at)
 
     async def cog_unload(self) -> None:
-        self.poll_loop.cancel()
-
-    @tasks.loop(seconds=30)
-    async def poll_loop(self) -> None:
-        due = await list_due_polls(_utcnow())
-        for poll in due:
-            channel = self.bot.get_channel(int(poll["channel_id"]))
-            if not isinstance(channel, discord.TextChannel):
-                await delete_poll(poll["id"])
-                continue
-            try:
-                message = await channel.fetch_message(int(poll["message_id"]))
-            except Exception:
-                await delete_poll(poll["id"])
-                continue
-            options = json.loads(poll["options_json"])
-            counts = await get_poll_counts(poll["id"], len(options))
-            embed = render_poll_embed(poll["question"], options, counts, poll["anonymous"])
-            embed.set_footer(text="Poll closed")
-            await message.edit(embed=embed, view=None)
-            await delete_poll(poll["id"])
+        self.bot.scheduler.unregister("poll")
+
+    async def _close_poll(self, poll_id: int) -> None:
+        poll = await get_poll(poll_id)
+        if not poll:
+            return
+        channel = self.bot.get_channel(int(poll["channel_id"]))
+        if not isinstance(channel, discord.TextChannel):
+            await delete_poll(poll_id)
+            return
+        try:
+            message = await channel.fetch_message(int(poll["message_id"]))
+        except Exception:
+            await delete_poll(poll_id)
+            return
+        options = json.loads(poll["options_json"])
+        counts = await get_poll_counts(poll_id, len(options))
+        embed = render_poll_embed(poll["question"], options, counts, poll["anonymous"])
+        embed.set_footer(text="Poll closed")
+        await message.edit(embed=embed, view=None)
+        await delete_poll(poll_id)
 
     @app_commands.command(name="poll", description="Create a poll.")
     async def poll(
@@ -145,6 +147,8 @@ class PollsCog(commands.Cog):
             ends_at,
             interaction.user.id,
         )
+        if ends_at:
+            self.bot.scheduler.schedule("poll", poll_id, ends_at)
         view = PollView(poll_id, opts)
         await message.edit(view=view)
         self.bot.add_view(view)
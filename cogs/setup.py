@@ -300,6 +300,8 @@ class SetupCog(commands.Cog):
         embed.add_field(name="Giveaway", value="On" if cfg.get("giveaway_enabled") else "Off", inline=True)
         embed.add_field(name="Reminders", value="On" if cfg.get("reminders_enabled") else "Off", inline=True)
         embed.add_field(name="Polls", value="On" if cfg.get("polls_enabled") else "Off", inline=True)
+        idle_minutes = cfg.get("music_idle_minutes") or 0
+        embed.add_field(name="Music idle", value=f"{idle_minutes} min" if idle_minutes > 0 else "Never", inline=True)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @setup_group.command(name="modrole", description="Set the moderator role.")
@@ -314,6 +316,19 @@ class SetupCog(commands.Cog):
         await update_guild_config(interaction.guild.id, mod_role_id=role.id if role else None)
         await interaction.response.send_message("Moderator role updated.", ephemeral=True)
 
+    @setup_group.command(name="musicidle", description="Set how long the music player may stay idle.")
+    @app_commands.describe(minutes="Minutes with an empty queue or no listeners before leaving (0 = never)")
+    async def musicidle(self, interaction: discord.Interaction, minutes: app_commands.Range[int, 0, 1440]) -> None:
+        if not interaction.guild or not isinstance(interaction.user, discord.Member):
+            return
+        cfg = await get_guild_config(interaction.guild.id)
+        locale = cfg.get("locale") or "en"
+        if not await is_moderator(interaction.user):
+            await interaction.response.send_message(t(locale, "no_permission"), ephemeral=True)
+            return
+        await update_guild_config(interaction.guild.id, music_idle_minutes=minutes)
+        await interaction.response.send_message("Music idle timeout updated.", ephemeral=True)
+
     @setup_group.command(name="toggle", description="Enable or disable a module.")
     @app_commands.choices(
         module=[
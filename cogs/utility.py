@@ -11,7 +11,8 @@ from discord.ext import commands, tasks
 from db import (
     get_guild_config,
     create_reminder,
-    get_due_reminders,
+    get_reminder,
+    list_reminder_schedule,
     delete_reminder,
     set_birthday,
     list_birthdays_for_date,
@@ -26,17 +27,24 @@ from db import (
 from utils.time_utils import parse_duration, format_duration
 from utils.checks import is_moderator
 from utils.guards import module_enabled
+from utils.message_pipeline import AFK_STAGE, MessageContext
 
 
 class UtilityCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.reminder_loop.start()
         self.birthday_loop.start()
         self._last_birthday_date: Optional[str] = None
 
+    async def cog_load(self) -> None:
+        self.bot.message_pipeline.add_stage("afk", AFK_STAGE, self._handle_afk)
+        self.bot.scheduler.register("reminder", self._fire_reminder)
+        for reminder_id, remind_at in await list_reminder_schedule():
+            self.bot.scheduler.schedule("reminder", reminder_id, remind_at)
+
     async def cog_unload(self) -> None:
-        self.reminder_loop.cancel()
+        self.bot.message_pipeline.remove_stage("afk")
+        self.bot.scheduler.unregister("reminder")
         self.birthday_loop.cancel()
 
     def _format_afk_since(self, since_at: str) -> str:
@@ -46,20 +54,17 @@ class UtilityCog(commands.Cog):
         except Exception:
             return "some time ago"
 
-    @tasks.loop(seconds=30)
-    async def reminder_loop(self) -> None:
-        now_iso = datetime.now(timezone.utc).isoformat()
-        due = await get_due_reminders(now_iso)
-        for reminder in due:
-            channel = self.bot.get_channel(int(reminder["channel_id"]))
-            if not isinstance(channel, discord.TextChannel):
-                await delete_reminder(reminder["id"])
-                continue
+    async def _fire_reminder(self, reminder_id: int) -> None:
+        reminder = await get_reminder(reminder_id)
+        if not reminder:
+            return
+        channel = self.bot.get_channel(int(reminder["channel_id"]))
+        if isinstance(channel, discord.TextChannel):
             try:
                 await channel.send(f"<@{reminder['user_id']}> Reminder: {reminder['message']}")
             except Exception:
                 pass
-            await delete_reminder(reminder["id"])
+        await delete_reminder(reminder_id)
 
     @tasks.loop(minutes=60)
     async def birthday_loop(self) -> None:
@@ -81,10 +86,8 @@ class UtilityCog(commands.Cog):
             for user_id in users:
                 await channel.send(f"Happy birthday <@{user_id}>! 🎉")
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
-        if message.guild is None or message.author.bot:
-            return
+    async def _handle_afk(self, ctx: MessageContext) -> None:
+        message = ctx.message
         author_afk = await get_afk_status(message.guild.id, message.author.id)
         if author_afk:
             was_cleared = await clear_afk_status(message.guild.id, message.author.id)
@@ -131,7 +134,8 @@ class UtilityCog(commands.Cog):
             await interaction.response.send_message("Invalid duration.", ephemeral=True)
             return
         remind_at = datetime.now(timezone.utc) + timedelta(seconds=seconds)
-        await create_reminder(interaction.user.id, interaction.guild.id, interaction.channel_id, message, remind_at.isoformat())
+        reminder_id = await create_reminder(interaction.user.id, interaction.guild.id, interaction.channel_id, message, remind_at.isoformat())
+        self.bot.scheduler.schedule("reminder", reminder_id, remind_at)
         await interaction.response.send_message(f"Reminder set for {format_duration(seconds)}.", ephemeral=True)
 
     @app_commands.command(name="birthday", description="Set your birthday (MM-DD).")
@@ -10,6 +10,13 @@ BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = Path(os.getenv("DATA_DIR", BASE_DIR / "data"))
 CACHE_DIR = Path(os.getenv("CACHE_DIR", DATA_DIR / "cache"))
 DB_PATH = Path(os.getenv("DB_PATH", DATA_DIR / "bot.db"))
+DB_READ_CONNECTIONS = int(os.getenv("DB_READ_CONNECTIONS", "4"))
+DB_BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_BUSY_TIMEOUT_SECONDS", "5"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "65536"))
+DB_MMAP_SIZE_BYTES = int(os.getenv("DB_MMAP_SIZE_BYTES", str(256 * 1024 * 1024)))
+COUNTER_FLUSH_SECONDS = float(os.getenv("COUNTER_FLUSH_SECONDS", "5"))
+COUNTER_FLUSH_ROWS = int(os.getenv("COUNTER_FLUSH_ROWS", "500"))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "50000"))
 
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "").strip()
 OWNER_ID = int(os.getenv("OWNER_ID", "0") or "0")
@@ -31,17 +38,39 @@ LAVALINK_HOST = os.getenv("LAVALINK_HOST", "localhost").strip()
 LAVALINK_PORT = int(os.getenv("LAVALINK_PORT", "2333"))
 LAVALINK_PASSWORD = os.getenv("LAVALINK_PASSWORD", "youshallnotpass").strip()
 LAVALINK_SECURE = os.getenv("LAVALINK_SECURE", "0") == "1"
+LAVALINK_NODES = os.getenv("LAVALINK_NODES", "").strip()
+LAVALINK_CONNECT_RETRIES = int(os.getenv("LAVALINK_CONNECT_RETRIES", "3"))
+LAVALINK_STATS_INTERVAL_SECONDS = float(os.getenv("LAVALINK_STATS_INTERVAL_SECONDS", "30"))
+LAVALINK_RESUME_TIMEOUT_SECONDS = int(os.getenv("LAVALINK_RESUME_TIMEOUT_SECONDS", "60"))
+LAVALINK_FAILOVER_GRACE_SECONDS = float(os.getenv("LAVALINK_FAILOVER_GRACE_SECONDS", "5"))
+LAVALINK_SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("LAVALINK_SNAPSHOT_INTERVAL_SECONDS", "10"))
 
 CACHE_TTL_MINUTES = int(os.getenv("CACHE_TTL_MINUTES", "1440"))
 CACHE_MAX_GB = float(os.getenv("CACHE_MAX_GB", "10"))
 MUSIC_QUALITY = os.getenv("MUSIC_QUALITY", "bestaudio")
 MUSIC_MAX_QUEUE = int(os.getenv("MUSIC_MAX_QUEUE", "100"))
+MUSIC_PRELOAD_PERCENT = int(os.getenv("MUSIC_PRELOAD_PERCENT", "80"))
+MUSIC_SEARCH_CACHE_ENABLED = os.getenv("MUSIC_SEARCH_CACHE_ENABLED", "1") == "1"
+MUSIC_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("MUSIC_SEARCH_CACHE_TTL_SECONDS", "21600"))
+MUSIC_SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("MUSIC_SEARCH_CACHE_MAX_ENTRIES", "1000"))
+MUSIC_SEARCH_CACHE_MAX_BYTES = int(os.getenv("MUSIC_SEARCH_CACHE_MAX_BYTES", "16777216"))
+MUSIC_SEARCH_PARALLEL = os.getenv("MUSIC_SEARCH_PARALLEL", "1") == "1"
+MUSIC_SEARCH_SOURCE_TIMEOUT_SECONDS = float(os.getenv("MUSIC_SEARCH_SOURCE_TIMEOUT_SECONDS", "8"))
+MUSIC_IDLE_TIMEOUT_MINUTES = int(os.getenv("MUSIC_IDLE_TIMEOUT_MINUTES", "5"))
+MUSIC_IDLE_CHECK_SECONDS = float(os.getenv("MUSIC_IDLE_CHECK_SECONDS", "30"))
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
 DEFAULT_LOCALE = os.getenv("DEFAULT_LOCALE", "en").strip()
 MAX_AI_HISTORY = int(os.getenv("MAX_AI_HISTORY", "8"))
+AI_HISTORY_TOKEN_BUDGET = int(os.getenv("AI_HISTORY_TOKEN_BUDGET", "1500"))
 AI_COOLDOWN_SECONDS = int(os.getenv("AI_COOLDOWN_SECONDS", "8"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_GUILD_CONCURRENCY = int(os.getenv("AI_GUILD_CONCURRENCY", "2"))
+AI_TIMEOUT_SECONDS = float(os.getenv("AI_TIMEOUT_SECONDS", "30"))
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "1") == "1"
+AI_CACHE_TTL_SECONDS = float(os.getenv("AI_CACHE_TTL_SECONDS", "86400"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "2000"))
 
 VERIFY_CODE_TTL_MINUTES = int(os.getenv("VERIFY_CODE_TTL_MINUTES", "10"))
 
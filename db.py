@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import aiosqlite
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from sortedcontainers import SortedList
 
 from config import (
     DB_PATH,
+    DB_READ_CONNECTIONS,
+    DB_BUSY_TIMEOUT_SECONDS,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE_BYTES,
+    COUNTER_FLUSH_SECONDS,
+    COUNTER_FLUSH_ROWS,
     DEFAULT_LOCALE,
     OWNER_ID,
     ANTI_SPAM_ENABLED,
@@ -17,6 +30,7 @@ from config import (
     ANTI_RAID_WINDOW,
     CACHE_TTL_MINUTES,
     CACHE_MAX_GB,
+    MUSIC_IDLE_TIMEOUT_MINUTES,
     ANTI_INVITE_ENABLED,
     ANTI_LINK_ENABLED,
     ANTI_NSFW_ENABLED,
@@ -24,6 +38,7 @@ from config import (
     BOT_RATIO_GUARD_ENABLED,
     BOT_RATIO_MAX,
 )
+from utils.bounded_state import ExpiringMap
 from utils.superusers import is_superuser, is_primary_owner, list_superusers
 
 CREATE_SQL = ""
@@ -71,6 +86,7 @@ CREATE TABLE IF NOT EXISTS guild_config (
     bot_ratio_max REAL,
     cache_ttl_minutes INTEGER,
     cache_max_gb REAL,
+    music_idle_minutes INTEGER,
     welcome_message TEXT,
     goodbye_message TEXT,
     boost_message TEXT
@@ -99,6 +115,17 @@ CREATE TABLE IF NOT EXISTS economy (
     PRIMARY KEY (guild_id, user_id)
 );
 
+CREATE TABLE IF NOT EXISTS economy_ledger (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    balance INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    ref TEXT,
+    created_at TEXT NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS user_profile (
     guild_id INTEGER NOT NULL,
     user_id INTEGER NOT NULL,
@@ -287,8 +314,78 @@ CREATE TABLE IF NOT EXISTS giveaway_entries (
     user_id INTEGER NOT NULL,
     PRIMARY KEY (giveaway_id, user_id)
 );
+
+CREATE TABLE IF NOT EXISTS ai_history (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    messages_json TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS music_queues (
+    guild_id INTEGER PRIMARY KEY,
+    channel_id INTEGER,
+    tracks_json TEXT NOT NULL DEFAULT '[]',
+    head INTEGER NOT NULL DEFAULT 0,
+    current TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    loop_mode INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
 """
 
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {DB_MMAP_SIZE_BYTES}",
+    "PRAGMA temp_store = MEMORY",
+)
+
+SCHEMA_MIGRATIONS: List[Tuple[int, str]] = [
+    (
+        1,
+        """
+CREATE INDEX IF NOT EXISTS idx_warnings_guild_user ON warnings (guild_id, user_id, id);
+CREATE INDEX IF NOT EXISTS idx_reminders_remind_at ON reminders (remind_at);
+CREATE INDEX IF NOT EXISTS idx_polls_ends_at ON polls (ends_at) WHERE ends_at IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_polls_message ON polls (message_id);
+CREATE INDEX IF NOT EXISTS idx_giveaways_due ON giveaways (ends_at) WHERE ended_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_giveaways_message ON giveaways (message_id);
+CREATE INDEX IF NOT EXISTS idx_events_guild_time ON events (guild_id, event_time, id, channel_id, name);
+CREATE INDEX IF NOT EXISTS idx_verify_codes_expires ON verify_codes (expires_at);
+CREATE INDEX IF NOT EXISTS idx_tickets_channel ON tickets (channel_id);
+CREATE INDEX IF NOT EXISTS idx_birthdays_date ON birthdays (guild_id, month, day, user_id);
+""",
+    ),
+    (
+        2,
+        """
+CREATE INDEX IF NOT EXISTS idx_leveling_guild_xp ON leveling (guild_id, xp DESC, user_id, level);
+""",
+    ),
+    (
+        3,
+        """
+CREATE INDEX IF NOT EXISTS idx_economy_ledger_user ON economy_ledger (guild_id, user_id, id);
+""",
+    ),
+    (
+        4,
+        """
+DROP INDEX IF EXISTS idx_reminders_remind_at;
+DROP INDEX IF EXISTS idx_polls_ends_at;
+""",
+    ),
+    (
+        5,
+        """
+ALTER TABLE music_cache ADD COLUMN payload TEXT;
+UPDATE music_cache SET payload = filepath, filepath = '' WHERE quality LIKE 'search:%';
+""",
+    ),
+]
+
 DEFAULT_CONFIG = {
     "log_channel_id": None,
     "welcome_channel_id": None,
@@ -331,6 +428,7 @@ DEFAULT_CONFIG = {
     "bot_ratio_max": BOT_RATIO_MAX,
     "cache_ttl_minutes": CACHE_TTL_MINUTES,
     "cache_max_gb": CACHE_MAX_GB,
+    "music_idle_minutes": MUSIC_IDLE_TIMEOUT_MINUTES,
     "welcome_message": "Welcome {user} to {server}!",
     "goodbye_message": "Goodbye {user}.",
     "boost_message": "Thanks for boosting the server, {user}!",
@@ -378,6 +476,7 @@ GUILD_CONFIG_COLUMNS = [
     ("bot_ratio_max", "REAL", BOT_RATIO_MAX),
     ("cache_ttl_minutes", "INTEGER", CACHE_TTL_MINUTES),
     ("cache_max_gb", "REAL", CACHE_MAX_GB),
+    ("music_idle_minutes", "INTEGER", MUSIC_IDLE_TIMEOUT_MINUTES),
     ("welcome_message", "TEXT", "Welcome {user} to {server}!"),
     ("goodbye_message", "TEXT", "Goodbye {user}."),
     ("boost_message", "TEXT", "Thanks for boosting the server, {user}!"),
@@ -414,6 +513,106 @@ def _sql_default(value: Any) -> str:
     return f"DEFAULT '{escaped}'"
 
 
+class ConnectionPool:
+    def __init__(self, path: Path, readers: int) -> None:
+        self.path = path
+        self.size = max(1, readers)
+        self.writer: Optional[aiosqlite.Connection] = None
+        self.write_lock = asyncio.Lock()
+        self.readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self.connections: List[aiosqlite.Connection] = []
+
+    async def _connect(self) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path, timeout=DB_BUSY_TIMEOUT_SECONDS)
+        db.row_factory = aiosqlite.Row
+        for pragma in CONNECTION_PRAGMAS:
+            await db.execute(pragma)
+        self.connections.append(db)
+        return db
+
+    async def open(self) -> None:
+        self.writer = await self._connect()
+        for _ in range(self.size):
+            self.readers.put_nowait(await self._connect())
+
+    async def close(self) -> None:
+        connections = self.connections
+        self.connections = []
+        self.writer = None
+        for db in connections:
+            try:
+                await db.close()
+            except Exception:
+                pass
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        db = await self.readers.get()
+        try:
+            yield db
+        finally:
+            self.readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[aiosqlite.Connection]:
+        async with self.write_lock:
+            db = self.writer
+            if db is None:
+                raise RuntimeError("Database pool is closed")
+            try:
+                yield db
+            except BaseException:
+                await db.rollback()
+                raise
+
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = asyncio.Lock()
+
+
+async def _get_pool() -> ConnectionPool:
+    global _POOL
+    if _POOL is not None:
+        return _POOL
+    async with _POOL_LOCK:
+        if _POOL is None:
+            pool = ConnectionPool(DB_PATH, DB_READ_CONNECTIONS)
+            await pool.open()
+            _POOL = pool
+    return _POOL
+
+
+@asynccontextmanager
+async def _reader() -> AsyncIterator[aiosqlite.Connection]:
+    pool = await _get_pool()
+    async with pool.read() as db:
+        yield db
+
+
+@asynccontextmanager
+async def _writer() -> AsyncIterator[aiosqlite.Connection]:
+    pool = await _get_pool()
+    async with pool.write() as db:
+        yield db
+
+
+async def close_db() -> None:
+    global _POOL
+    try:
+        await _COUNTERS.close()
+    except Exception:
+        logging.exception("Failed to flush buffered counters on shutdown")
+    try:
+        await _QUEUE_SNAPSHOTS.close()
+    except Exception:
+        logging.exception("Failed to flush music queue snapshots on shutdown")
+    async with _POOL_LOCK:
+        pool = _POOL
+        _POOL = None
+    if pool is not None:
+        await pool.close()
+
+
 async def _fetchone(db: aiosqlite.Connection, sql: str, params: Tuple[Any, ...] = ()) -> Any:
     cursor = await db.execute(sql, params)
     try:
@@ -440,28 +639,96 @@ async def _ensure_columns(db: aiosqlite.Connection, table: str, columns: List[Tu
         await db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type} {default_sql}")
 
 
+async def _apply_migrations(db: aiosqlite.Connection) -> None:
+    row = await _fetchone(db, "PRAGMA user_version")
+    current = int(row[0]) if row else 0
+    for version, sql in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        await db.executescript(f"BEGIN;\n{sql}\nPRAGMA user_version = {version};\nCOMMIT;")
+        current = version
+
+
 async def init_db() -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    await _get_pool()
+    async with _writer() as db:
+        await _fetchone(db, "PRAGMA journal_mode = WAL")
         await db.executescript(CREATE_SQL)
         await _ensure_columns(db, "guild_config", GUILD_CONFIG_COLUMNS)
         await db.commit()
+        await _apply_migrations(db)
+        await db.execute("PRAGMA optimize")
 
 
-async def get_guild_config(guild_id: int) -> Dict[str, Any]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+class GuildConfigCache:
+    def __init__(self) -> None:
+        self.entries: Dict[int, Mapping[str, Any]] = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, guild_id: int) -> Optional[Mapping[str, Any]]:
+        snapshot = self.entries.get(guild_id)
+        if snapshot is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return snapshot
+
+    def store(self, guild_id: int, row: Any, version: int) -> Mapping[str, Any]:
+        snapshot = MappingProxyType(dict(row))
+        if version == self.version:
+            self.entries[guild_id] = snapshot
+        return snapshot
+
+    def refresh(self, guild_id: int, row: Any) -> Mapping[str, Any]:
+        self.version += 1
+        snapshot = MappingProxyType(dict(row))
+        self.entries[guild_id] = snapshot
+        return snapshot
+
+    def invalidate(self, guild_id: Optional[int] = None) -> None:
+        self.version += 1
+        if guild_id is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(guild_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+
+_CONFIG_CACHE = GuildConfigCache()
+
+
+def guild_config_cache_stats() -> Dict[str, int]:
+    return _CONFIG_CACHE.stats()
+
+
+def invalidate_guild_config(guild_id: Optional[int] = None) -> None:
+    _CONFIG_CACHE.invalidate(guild_id)
+
+
+async def get_guild_config(guild_id: int) -> Mapping[str, Any]:
+    snapshot = _CONFIG_CACHE.get(guild_id)
+    if snapshot is not None:
+        return snapshot
+    version = _CONFIG_CACHE.version
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT * FROM guild_config WHERE guild_id = ?",
             (guild_id,),
         )
-        if row is None:
-            await _insert_default_config(db, guild_id)
-            await db.commit()
-            row = await _fetchone(db, 
-                "SELECT * FROM guild_config WHERE guild_id = ?",
-                (guild_id,),
-            )
-        return dict(row)
+    if row is not None:
+        return _CONFIG_CACHE.store(guild_id, row, version)
+    async with _writer() as db:
+        await _insert_default_config(db, guild_id)
+        await db.commit()
+        row = await _fetchone(db, 
+            "SELECT * FROM guild_config WHERE guild_id = ?",
+            (guild_id,),
+        )
+        return _CONFIG_CACHE.store(guild_id, row, version)
 
 
 async def _insert_default_config(db: aiosqlite.Connection, guild_id: int) -> None:
@@ -479,16 +746,21 @@ async def update_guild_config(guild_id: int, **kwargs: Any) -> None:
         return
     fields = ",".join([f"{k} = ?" for k in kwargs.keys()])
     values = list(kwargs.values()) + [guild_id]
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await _insert_default_config(db, guild_id)
         await db.execute(f"UPDATE guild_config SET {fields} WHERE guild_id = ?", values)
         await db.commit()
+        row = await _fetchone(db, "SELECT * FROM guild_config WHERE guild_id = ?", (guild_id,))
+        if row is None:
+            _CONFIG_CACHE.invalidate(guild_id)
+        else:
+            _CONFIG_CACHE.refresh(guild_id, row)
 
 
 async def add_warning(guild_id: int, user_id: int, moderator_id: int, reason: str) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, created_at) VALUES (?, ?, ?, ?, ?)",
             (guild_id, user_id, moderator_id, reason, _utcnow()),
@@ -499,8 +771,7 @@ async def add_warning(guild_id: int, user_id: int, moderator_id: int, reason: st
 async def get_warnings(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
     if _is_owner_god(user_id):
         return []
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT * FROM warnings WHERE guild_id = ? AND user_id = ? ORDER BY id DESC",
             (guild_id, user_id),
@@ -511,7 +782,7 @@ async def get_warnings(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
 async def clear_warnings(guild_id: int, user_id: int) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "DELETE FROM warnings WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
@@ -519,89 +790,153 @@ async def clear_warnings(guild_id: int, user_id: int) -> None:
         await db.commit()
 
 
+_BLOCKED_WORDS: Dict[int, Tuple[str, ...]] = {}
+_BLOCKED_VERSION = 0
+
+
 async def add_blocked_word(guild_id: int, word: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    global _BLOCKED_VERSION
+    async with _writer() as db:
         await db.execute(
             "INSERT OR IGNORE INTO blocked_words (guild_id, word) VALUES (?, ?)",
             (guild_id, word.lower()),
         )
         await db.commit()
+        _BLOCKED_VERSION += 1
+        _BLOCKED_WORDS.pop(guild_id, None)
 
 
 async def remove_blocked_word(guild_id: int, word: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    global _BLOCKED_VERSION
+    async with _writer() as db:
         await db.execute(
             "DELETE FROM blocked_words WHERE guild_id = ? AND word = ?",
             (guild_id, word.lower()),
         )
         await db.commit()
+        _BLOCKED_VERSION += 1
+        _BLOCKED_WORDS.pop(guild_id, None)
 
 
-async def list_blocked_words(guild_id: int) -> List[str]:
-    async with aiosqlite.connect(DB_PATH) as db:
+async def get_blocked_words(guild_id: int) -> Tuple[str, ...]:
+    words = _BLOCKED_WORDS.get(guild_id)
+    if words is not None:
+        return words
+    version = _BLOCKED_VERSION
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT word FROM blocked_words WHERE guild_id = ? ORDER BY word ASC",
             (guild_id,),
         )
-        return [r[0] for r in rows]
+    words = tuple(r[0] for r in rows)
+    if version == _BLOCKED_VERSION:
+        _BLOCKED_WORDS[guild_id] = words
+    return words
+
+
+async def list_blocked_words(guild_id: int) -> List[str]:
+    return list(await get_blocked_words(guild_id))
 
 
 async def get_balance(guild_id: int, user_id: int) -> Tuple[int, Optional[str]]:
     if _is_owner_god(user_id):
         return GOD_COINS, None
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT balance, last_daily FROM economy WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
         )
-        if row is None:
-            await db.execute(
-                "INSERT INTO economy (guild_id, user_id, balance) VALUES (?, ?, 0)",
-                (guild_id, user_id),
-            )
-            await db.commit()
-            return 0, None
+    if row is not None:
         return row[0], row[1]
+    async with _writer() as db:
+        await db.execute(
+            "INSERT OR IGNORE INTO economy (guild_id, user_id, balance) VALUES (?, ?, 0)",
+            (guild_id, user_id),
+        )
+        await db.commit()
+        return 0, None
 
 
-async def update_balance(guild_id: int, user_id: int, delta: int) -> int:
+async def update_balance(guild_id: int, user_id: int, delta: int, reason: str = "adjust") -> int:
     if _is_owner_god(user_id):
         return GOD_COINS
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO economy (guild_id, user_id, balance) VALUES (?, ?, 0) ON CONFLICT(guild_id, user_id) DO NOTHING",
-            (guild_id, user_id),
+    async with _writer() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        row = await _fetchone(
+            db,
+            "INSERT INTO economy (guild_id, user_id, balance) VALUES (?, ?, ?) "
+            "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = balance + excluded.balance RETURNING balance",
+            (guild_id, user_id, delta),
+        )
+        balance = row[0] if row else 0
+        await _record_ledger(db, guild_id, user_id, delta, balance, reason)
+        await db.commit()
+    return balance
+
+
+async def purchase_item(guild_id: int, user_id: int, item_id: str, price: int, count: int = 1) -> Optional[int]:
+    if _is_owner_god(user_id):
+        return GOD_COINS
+    async with _writer() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        row = await _fetchone(
+            db,
+            "UPDATE economy SET balance = balance - ? WHERE guild_id = ? AND user_id = ? AND balance >= ? RETURNING balance",
+            (price, guild_id, user_id, price),
         )
+        if row is None:
+            await db.rollback()
+            return None
         await db.execute(
-            "UPDATE economy SET balance = balance + ? WHERE guild_id = ? AND user_id = ?",
-            (delta, guild_id, user_id),
+            "INSERT INTO user_items (guild_id, user_id, item_id, count) VALUES (?, ?, ?, ?)\n"
+            "ON CONFLICT(guild_id, user_id, item_id) DO UPDATE SET count = count + excluded.count",
+            (guild_id, user_id, item_id, count),
         )
+        await _record_ledger(db, guild_id, user_id, -price, row[0], "purchase", item_id)
         await db.commit()
-        row = await _fetchone(db, 
-            "SELECT balance FROM economy WHERE guild_id = ? AND user_id = ?",
-            (guild_id, user_id),
-        )
-        return row[0] if row else 0
+    return row[0]
 
 
 async def set_balance(guild_id: int, user_id: int, amount: int) -> int:
     if _is_owner_god(user_id):
         return GOD_COINS
     amount = max(0, int(amount))
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        row = await _fetchone(
+            db,
+            "SELECT balance FROM economy WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
         await db.execute(
             "INSERT INTO economy (guild_id, user_id, balance) VALUES (?, ?, ?) "
             "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance=excluded.balance",
             (guild_id, user_id, amount),
         )
+        await _record_ledger(db, guild_id, user_id, amount - (row[0] if row else 0), amount, "set")
         await db.commit()
-        return amount
+    return amount
+
+
+async def _record_ledger(
+    db: aiosqlite.Connection,
+    guild_id: int,
+    user_id: int,
+    delta: int,
+    balance: int,
+    reason: str,
+    ref: Optional[str] = None,
+) -> None:
+    await db.execute(
+        "INSERT INTO economy_ledger (guild_id, user_id, delta, balance, reason, ref, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (guild_id, user_id, delta, balance, reason, ref, _utcnow()),
+    )
 
 
 async def set_last_daily(guild_id: int, user_id: int, iso_time: str) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "UPDATE economy SET last_daily = ? WHERE guild_id = ? AND user_id = ?",
             (iso_time, guild_id, user_id),
@@ -610,7 +945,7 @@ async def set_last_daily(guild_id: int, user_id: int, iso_time: str) -> None:
 
 
 async def upsert_user_profile(guild_id: int, user_id: int, title: Optional[str], frame: Optional[str]) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO user_profile (guild_id, user_id, title, frame) VALUES (?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id) DO UPDATE SET title=excluded.title, frame=excluded.frame",
@@ -620,8 +955,7 @@ async def upsert_user_profile(guild_id: int, user_id: int, title: Optional[str],
 
 
 async def get_user_profile(guild_id: int, user_id: int) -> Dict[str, Any]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT title, frame FROM user_profile WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
@@ -632,7 +966,7 @@ async def get_user_profile(guild_id: int, user_id: int) -> Dict[str, Any]:
 async def add_user_item(guild_id: int, user_id: int, item_id: str, count: int = 1) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO user_items (guild_id, user_id, item_id, count) VALUES (?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id, item_id) DO UPDATE SET count = count + ?",
@@ -644,8 +978,7 @@ async def add_user_item(guild_id: int, user_id: int, item_id: str, count: int =
 async def get_user_items(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
     if _is_owner_god(user_id):
         return [{"item_id": item_id, "count": GOD_ITEM_COUNT} for item_id in GOD_USER_ITEM_IDS]
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT item_id, count FROM user_items WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
@@ -653,6 +986,437 @@ async def get_user_items(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
         return [dict(r) for r in rows]
 
 
+class LevelingDelta:
+    __slots__ = ("xp", "level", "last_xp_at", "message_count", "voice_seconds")
+
+    def __init__(self) -> None:
+        self.xp = 0
+        self.level: Optional[int] = None
+        self.last_xp_at: Optional[str] = None
+        self.message_count = 0
+        self.voice_seconds = 0
+
+
+class CounterBuffer:
+    def __init__(self, interval: float, max_rows: int) -> None:
+        self.interval = max(0.1, interval)
+        self.max_rows = max(1, max_rows)
+        self.leveling: Dict[Tuple[int, int], LevelingDelta] = {}
+        self.daily: Dict[Tuple[int, int, str, str], int] = {}
+        self.flushing_leveling: Dict[Tuple[int, int], LevelingDelta] = {}
+        self.flushing_daily: Dict[Tuple[int, int, str, str], int] = {}
+        self.history: Dict[Tuple[int, int], List[Dict[str, str]]] = {}
+        self.flushing_history: Dict[Tuple[int, int], List[Dict[str, str]]] = {}
+        self.flush_lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+        self.eager: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def pending(self) -> int:
+        return len(self.leveling) + len(self.daily) + len(self.history)
+
+    def leveling_delta(self, guild_id: int, user_id: int) -> LevelingDelta:
+        key = (guild_id, user_id)
+        delta = self.leveling.get(key)
+        if delta is None:
+            delta = LevelingDelta()
+            self.leveling[key] = delta
+        return delta
+
+    def add_daily(self, guild_id: int, user_id: int, date: str, task_type: str, delta: int) -> None:
+        key = (guild_id, user_id, date, task_type)
+        self.daily[key] = self.daily.get(key, 0) + delta
+
+    def overlay_leveling(self, guild_id: int, user_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
+        key = (guild_id, user_id)
+        for delta in (self.flushing_leveling.get(key), self.leveling.get(key)):
+            if delta is None:
+                continue
+            data["xp"] = int(data["xp"]) + delta.xp
+            data["message_count"] = int(data["message_count"]) + delta.message_count
+            data["voice_seconds"] = int(data["voice_seconds"]) + delta.voice_seconds
+            if delta.level is not None:
+                data["level"] = delta.level
+            if delta.last_xp_at is not None:
+                data["last_xp_at"] = delta.last_xp_at
+        return data
+
+    def overlay_daily(self, guild_id: int, user_id: int, date: str, task_type: str) -> int:
+        key = (guild_id, user_id, date, task_type)
+        return self.flushing_daily.get(key, 0) + self.daily.get(key, 0)
+
+    def discard_xp(self, guild_id: int, user_id: int) -> None:
+        for pending in (self.flushing_leveling, self.leveling):
+            delta = pending.get((guild_id, user_id))
+            if delta is not None:
+                delta.xp = 0
+                delta.level = None
+                delta.last_xp_at = None
+
+    def schedule(self) -> None:
+        if self.pending() >= self.max_rows:
+            if self.eager is None or self.eager.done():
+                self.eager = asyncio.create_task(self._flush_logged())
+            return
+        if self.timer is None or self.timer.done():
+            self.timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        self.timer = None
+        await self._flush_logged()
+
+    async def _flush_logged(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            logging.exception("Counter buffer flush failed")
+
+    async def flush(self) -> None:
+        async with self.flush_lock:
+            if not self.pending():
+                return
+            self.flushing_leveling, self.leveling = self.leveling, {}
+            self.flushing_daily, self.daily = self.daily, {}
+            self.flushing_history, self.history = self.history, {}
+            leveling_rows = [
+                (
+                    guild_id,
+                    user_id,
+                    d.xp,
+                    d.level if d.level is not None else 1,
+                    d.last_xp_at,
+                    d.message_count,
+                    d.voice_seconds,
+                    d.level,
+                )
+                for (guild_id, user_id), d in self.flushing_leveling.items()
+            ]
+            daily_rows = [
+                (delta, guild_id, user_id, date, task_type)
+                for (guild_id, user_id, date, task_type), delta in self.flushing_daily.items()
+                if delta
+            ]
+            now_iso = _utcnow()
+            history_rows = [
+                (guild_id, user_id, json.dumps(messages), now_iso)
+                for (guild_id, user_id), messages in self.flushing_history.items()
+            ]
+            try:
+                async with _writer() as db:
+                    if leveling_rows:
+                        await db.executemany(
+                            "INSERT INTO leveling (guild_id, user_id, xp, level, last_xp_at, message_count, voice_seconds) VALUES (?, ?, ?, ?, ?, ?, ?)\n"
+                            "ON CONFLICT(guild_id, user_id) DO UPDATE SET xp = xp + excluded.xp, level = COALESCE(?, level), "
+                            "last_xp_at = COALESCE(excluded.last_xp_at, last_xp_at), message_count = message_count + excluded.message_count, "
+                            "voice_seconds = voice_seconds + excluded.voice_seconds",
+                            leveling_rows,
+                        )
+                    if daily_rows:
+                        await db.executemany(
+                            "UPDATE daily_tasks SET progress = progress + ? WHERE guild_id = ? AND user_id = ? AND date = ? AND task_type = ?",
+                            daily_rows,
+                        )
+                    if history_rows:
+                        await db.executemany(
+                            "INSERT INTO ai_history (guild_id, user_id, messages_json, updated_at) VALUES (?, ?, ?, ?)\n"
+                            "ON CONFLICT(guild_id, user_id) DO UPDATE SET messages_json = excluded.messages_json, updated_at = excluded.updated_at",
+                            history_rows,
+                        )
+                    await db.commit()
+            except Exception:
+                self._restore()
+                raise
+            self.flushes += 1
+            self.rows_flushed += len(leveling_rows) + len(daily_rows) + len(history_rows)
+            self.flushing_leveling = {}
+            self.flushing_daily = {}
+            self.flushing_history = {}
+
+    def _restore(self) -> None:
+        for key, old in self.flushing_leveling.items():
+            current = self.leveling.get(key)
+            if current is None:
+                self.leveling[key] = old
+                continue
+            current.xp += old.xp
+            current.message_count += old.message_count
+            current.voice_seconds += old.voice_seconds
+            if current.level is None:
+                current.level = old.level
+            if current.last_xp_at is None:
+                current.last_xp_at = old.last_xp_at
+        for key, delta in self.flushing_daily.items():
+            self.daily[key] = self.daily.get(key, 0) + delta
+        for key, messages in self.flushing_history.items():
+            self.history.setdefault(key, messages)
+        self.flushing_leveling = {}
+        self.flushing_daily = {}
+        self.flushing_history = {}
+
+    async def close(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending": self.pending(), "flushes": self.flushes, "rows_flushed": self.rows_flushed}
+
+
+_COUNTERS = CounterBuffer(COUNTER_FLUSH_SECONDS, COUNTER_FLUSH_ROWS)
+
+
+async def flush_counters() -> None:
+    await _COUNTERS.flush()
+
+
+def counter_buffer_stats() -> Dict[str, int]:
+    return _COUNTERS.stats()
+
+
+async def load_ai_history(guild_id: int, user_id: int) -> List[Dict[str, str]]:
+    key = (guild_id, user_id)
+    pending = _COUNTERS.history.get(key)
+    if pending is None:
+        pending = _COUNTERS.flushing_history.get(key)
+    if pending is not None:
+        return list(pending)
+    async with _reader() as db:
+        row = await _fetchone(
+            db,
+            "SELECT messages_json FROM ai_history WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
+    if row is None:
+        return []
+    try:
+        messages = json.loads(row[0])
+    except Exception:
+        return []
+    return [
+        {"role": str(msg.get("role")), "content": str(msg.get("content"))}
+        for msg in messages
+        if isinstance(msg, dict) and msg.get("role") in ("user", "assistant")
+    ]
+
+
+async def save_ai_history(guild_id: int, user_id: int, messages: List[Dict[str, str]]) -> None:
+    _COUNTERS.history[(guild_id, user_id)] = list(messages)
+    _COUNTERS.schedule()
+
+
+_QUEUE_UPSERT_SQL = (
+    "INSERT INTO music_queues (guild_id, channel_id, tracks_json, head, current, position, loop_mode, updated_at) "
+    "VALUES (?, ?, '[]', ?, ?, ?, ?, ?)\n"
+    "ON CONFLICT(guild_id) DO UPDATE SET channel_id = excluded.channel_id, head = excluded.head, "
+    "current = excluded.current, position = excluded.position, loop_mode = excluded.loop_mode, "
+    "updated_at = excluded.updated_at"
+)
+
+
+class QueueSnapshotBuffer:
+    def __init__(self, interval: float) -> None:
+        self.interval = max(0.1, interval)
+        self.pending: Dict[int, Tuple[Optional[int], int, Optional[str], int, int, str]] = {}
+        self.lock = asyncio.Lock()
+        self.timer: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.rows_flushed = 0
+
+    def put(
+        self,
+        guild_id: int,
+        channel_id: Optional[int],
+        head: int,
+        current: Optional[str],
+        position: int,
+        loop_mode: int,
+    ) -> None:
+        self.pending[guild_id] = (channel_id, head, current, position, loop_mode, _utcnow())
+        if self.timer is None or self.timer.done():
+            self.timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        self.timer = None
+        try:
+            await self.flush()
+        except Exception:
+            logging.exception("Music queue snapshot flush failed")
+
+    async def flush(self) -> None:
+        async with self.lock:
+            if not self.pending:
+                return
+            flushing, self.pending = self.pending, {}
+            rows = [(guild_id, *row) for guild_id, row in flushing.items()]
+            try:
+                async with _writer() as db:
+                    await db.executemany(_QUEUE_UPSERT_SQL, rows)
+                    await db.commit()
+            except Exception:
+                for guild_id, row in flushing.items():
+                    self.pending.setdefault(guild_id, row)
+                raise
+            self.flushes += 1
+            self.rows_flushed += len(rows)
+
+    async def close(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        await self.flush()
+
+
+_QUEUE_SNAPSHOTS = QueueSnapshotBuffer(COUNTER_FLUSH_SECONDS)
+
+
+async def save_music_queue(
+    guild_id: int,
+    channel_id: Optional[int],
+    tracks: Optional[List[str]],
+    head: int,
+    current: Optional[str],
+    position: int,
+    loop_mode: int,
+) -> None:
+    if tracks is None:
+        _QUEUE_SNAPSHOTS.put(guild_id, channel_id, head, current, position, loop_mode)
+        return
+    async with _QUEUE_SNAPSHOTS.lock:
+        _QUEUE_SNAPSHOTS.pending.pop(guild_id, None)
+        async with _writer() as db:
+            await db.execute(
+                "INSERT INTO music_queues (guild_id, channel_id, tracks_json, head, current, position, loop_mode, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)\n"
+                "ON CONFLICT(guild_id) DO UPDATE SET channel_id = excluded.channel_id, tracks_json = excluded.tracks_json, "
+                "head = excluded.head, current = excluded.current, position = excluded.position, "
+                "loop_mode = excluded.loop_mode, updated_at = excluded.updated_at",
+                (
+                    guild_id,
+                    channel_id,
+                    json.dumps(tracks, separators=(",", ":")),
+                    head,
+                    current,
+                    position,
+                    loop_mode,
+                    _utcnow(),
+                ),
+            )
+            await db.commit()
+
+
+async def delete_music_queue(guild_id: int) -> None:
+    async with _QUEUE_SNAPSHOTS.lock:
+        _QUEUE_SNAPSHOTS.pending.pop(guild_id, None)
+        async with _writer() as db:
+            await db.execute("DELETE FROM music_queues WHERE guild_id = ?", (guild_id,))
+            await db.commit()
+
+
+async def load_music_queue(guild_id: int) -> Optional[Dict[str, Any]]:
+    await _QUEUE_SNAPSHOTS.flush()
+    async with _reader() as db:
+        row = await _fetchone(
+            db,
+            "SELECT channel_id, tracks_json, head, current, position, loop_mode FROM music_queues WHERE guild_id = ?",
+            (guild_id,),
+        )
+    if row is None:
+        return None
+    try:
+        tracks = [str(track) for track in json.loads(row["tracks_json"])]
+    except Exception:
+        tracks = []
+    return {
+        "channel_id": row["channel_id"],
+        "tracks": tracks[int(row["head"]):],
+        "current": row["current"],
+        "position": int(row["position"]),
+        "loop_mode": int(row["loop_mode"]),
+    }
+
+
+class GuildLeaderboard:
+    __slots__ = ("keys", "xp", "levels")
+
+    def __init__(self, rows: List[Tuple[int, int, int]]) -> None:
+        self.xp: Dict[int, int] = {}
+        self.levels: Dict[int, int] = {}
+        for user_id, xp, level in rows:
+            self.xp[user_id] = xp
+            self.levels[user_id] = level
+        self.keys: SortedList = SortedList((-xp, user_id) for user_id, xp in self.xp.items())
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set(self, user_id: int, xp: int, level: Optional[int] = None) -> None:
+        old = self.xp.get(user_id)
+        if old is not None:
+            self.keys.remove((-old, user_id))
+        self.xp[user_id] = xp
+        if level is not None or user_id not in self.levels:
+            self.levels[user_id] = level if level is not None else 1
+        self.keys.add((-xp, user_id))
+
+    def add(self, user_id: int, xp: int, level: Optional[int] = None) -> None:
+        self.set(user_id, self.xp.get(user_id, 0) + xp, level)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        xp = self.xp.get(user_id)
+        if xp is None:
+            return None
+        return self.keys.bisect_left((-xp, user_id)) + 1
+
+    def page(self, offset: int, limit: int) -> List[Dict[str, Any]]:
+        return [
+            {"user_id": user_id, "xp": -neg_xp, "level": self.levels.get(user_id, 1)}
+            for neg_xp, user_id in self.keys.islice(offset, offset + limit)
+        ]
+
+
+_LEADERBOARDS: ExpiringMap[GuildLeaderboard] = ExpiringMap("leaderboards", 3600.0, 512)
+_LEADERBOARD_LOCKS: Dict[int, asyncio.Lock] = {}
+
+
+async def _leaderboard(guild_id: int) -> GuildLeaderboard:
+    board = _LEADERBOARDS.get(guild_id)
+    if board is not None:
+        return board
+    lock = _LEADERBOARD_LOCKS.setdefault(guild_id, asyncio.Lock())
+    async with lock:
+        board = _LEADERBOARDS.get(guild_id)
+        if board is not None:
+            return board
+        async with _COUNTERS.flush_lock:
+            async with _reader() as db:
+                rows = await _fetchall(
+                    db,
+                    "SELECT user_id, xp, level FROM leveling WHERE guild_id = ? ORDER BY xp DESC",
+                    (guild_id,),
+                )
+            board = GuildLeaderboard([(r["user_id"], int(r["xp"]), int(r["level"])) for r in rows])
+            for (pending_guild, user_id), delta in _COUNTERS.leveling.items():
+                if pending_guild == guild_id and (delta.xp or delta.level is not None):
+                    board.add(user_id, delta.xp, delta.level)
+            _LEADERBOARDS.set(guild_id, board)
+        _LEADERBOARD_LOCKS.pop(guild_id, None)
+        return board
+
+
+def _privileged_ids() -> List[int]:
+    privileged_ids: List[int] = []
+    if is_primary_owner(OWNER_ID):
+        privileged_ids.append(OWNER_ID)
+    for user_id in list_superusers():
+        if user_id not in privileged_ids:
+            privileged_ids.append(user_id)
+    return privileged_ids
+
+
 async def get_leveling(guild_id: int, user_id: int) -> Dict[str, Any]:
     if _is_owner_god(user_id):
         return {
@@ -662,102 +1426,113 @@ async def get_leveling(guild_id: int, user_id: int) -> Dict[str, Any]:
             "message_count": GOD_MESSAGE_COUNT,
             "voice_seconds": GOD_VOICE_SECONDS,
         }
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT xp, level, last_xp_at, message_count, voice_seconds FROM leveling WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
         )
-        if row is None:
-            await db.execute(
-                "INSERT INTO leveling (guild_id, user_id, xp, level) VALUES (?, ?, 0, 1)",
-                (guild_id, user_id),
-            )
-            await db.commit()
-            return {"xp": 0, "level": 1, "last_xp_at": None, "message_count": 0, "voice_seconds": 0}
-        return dict(row)
+    if row is not None:
+        return _COUNTERS.overlay_leveling(guild_id, user_id, dict(row))
+    async with _writer() as db:
+        cursor = await db.execute(
+            "INSERT OR IGNORE INTO leveling (guild_id, user_id, xp, level) VALUES (?, ?, 0, 1)",
+            (guild_id, user_id),
+        )
+        await db.commit()
+    board = _LEADERBOARDS.get(guild_id)
+    if board is not None and cursor.rowcount and board.rank(user_id) is None:
+        board.set(user_id, 0, 1)
+    data = {"xp": 0, "level": 1, "last_xp_at": None, "message_count": 0, "voice_seconds": 0}
+    return _COUNTERS.overlay_leveling(guild_id, user_id, data)
 
 
 async def set_leveling(guild_id: int, user_id: int, xp: int, level: int, last_xp_at: Optional[str]) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    _COUNTERS.discard_xp(guild_id, user_id)
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO leveling (guild_id, user_id, xp, level, last_xp_at) VALUES (?, ?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id) DO UPDATE SET xp=excluded.xp, level=excluded.level, last_xp_at=excluded.last_xp_at",
             (guild_id, user_id, xp, level, last_xp_at),
         )
         await db.commit()
+    board = _LEADERBOARDS.get(guild_id)
+    if board is not None:
+        board.set(user_id, xp, level)
+
+
+async def add_leveling_xp(guild_id: int, user_id: int, xp: int, level: int, last_xp_at: Optional[str]) -> None:
+    if _is_owner_god(user_id):
+        return
+    delta = _COUNTERS.leveling_delta(guild_id, user_id)
+    delta.xp += xp
+    delta.level = level
+    delta.last_xp_at = last_xp_at
+    board = _LEADERBOARDS.get(guild_id)
+    if board is not None:
+        board.add(user_id, xp, level)
+    _COUNTERS.schedule()
 
 
 async def increment_message_count(guild_id: int, user_id: int, count: int = 1) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO leveling (guild_id, user_id, xp, level, message_count) VALUES (?, ?, 0, 1, 0)\n"
-            "ON CONFLICT(guild_id, user_id) DO NOTHING",
-            (guild_id, user_id),
-        )
-        await db.execute(
-            "UPDATE leveling SET message_count = message_count + ? WHERE guild_id = ? AND user_id = ?",
-            (count, guild_id, user_id),
-        )
-        await db.commit()
+    _COUNTERS.leveling_delta(guild_id, user_id).message_count += count
+    _COUNTERS.schedule()
 
 
 async def increment_voice_seconds(guild_id: int, user_id: int, seconds: int) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO leveling (guild_id, user_id, xp, level, voice_seconds) VALUES (?, ?, 0, 1, 0)\n"
-            "ON CONFLICT(guild_id, user_id) DO NOTHING",
-            (guild_id, user_id),
-        )
-        await db.execute(
-            "UPDATE leveling SET voice_seconds = voice_seconds + ? WHERE guild_id = ? AND user_id = ?",
-            (seconds, guild_id, user_id),
-        )
-        await db.commit()
+    _COUNTERS.leveling_delta(guild_id, user_id).voice_seconds += seconds
+    _COUNTERS.schedule()
 
 
-async def get_leaderboard(guild_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+async def get_leaderboard(guild_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
     if limit <= 0:
         return []
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        rows = await _fetchall(db, 
-            "SELECT user_id, xp, level, message_count, voice_seconds FROM leveling WHERE guild_id = ? ORDER BY xp DESC LIMIT ?",
-            (guild_id, limit),
-        )
-        data = [dict(r) for r in rows]
-    privileged_ids: List[int] = []
-    if is_primary_owner(OWNER_ID):
-        privileged_ids.append(OWNER_ID)
-    for user_id in list_superusers():
-        if user_id not in privileged_ids:
-            privileged_ids.append(user_id)
-    if privileged_ids:
-        blocked = set(privileged_ids)
-        data = [row for row in data if int(row.get("user_id", 0)) not in blocked]
-        for user_id in reversed(privileged_ids):
-            data.insert(
-                0,
-                {
-                    "user_id": user_id,
-                    "xp": GOD_XP,
-                    "level": GOD_LEVEL,
-                    "message_count": GOD_MESSAGE_COUNT,
-                    "voice_seconds": GOD_VOICE_SECONDS,
-                },
-            )
-        return data[:limit]
+    privileged_ids = _privileged_ids()
+    data: List[Dict[str, Any]] = [
+        {"user_id": user_id, "xp": GOD_XP, "level": GOD_LEVEL}
+        for user_id in privileged_ids[offset:offset + limit]
+    ]
+    offset = max(0, offset - len(privileged_ids))
+    if len(data) >= limit:
+        return data
+    board = await _leaderboard(guild_id)
+    blocked = set(privileged_ids)
+    start = offset
+    for position in sorted(rank - 1 for rank in map(board.rank, blocked) if rank is not None):
+        if position > start:
+            break
+        start += 1
+    while len(data) < limit:
+        chunk = board.page(start, limit - len(data))
+        if not chunk:
+            break
+        start += len(chunk)
+        data.extend(row for row in chunk if row["user_id"] not in blocked)
     return data
 
 
+async def get_leaderboard_rank(guild_id: int, user_id: int) -> Tuple[Optional[int], int]:
+    privileged_ids = _privileged_ids()
+    board = await _leaderboard(guild_id)
+    blocked = set(privileged_ids)
+    listed = len(board) - sum(1 for privileged in blocked if board.rank(privileged) is not None)
+    total = len(privileged_ids) + listed
+    if user_id in blocked:
+        return privileged_ids.index(user_id) + 1, total
+    rank = board.rank(user_id)
+    if rank is None:
+        return None, total
+    ahead = sum(1 for privileged in blocked if (board.rank(privileged) or rank) < rank)
+    return len(privileged_ids) + rank - ahead, total
+
+
 async def add_badge(guild_id: int, user_id: int, badge: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT OR IGNORE INTO badges (guild_id, user_id, badge) VALUES (?, ?, ?)",
             (guild_id, user_id, badge),
@@ -768,7 +1543,7 @@ async def add_badge(guild_id: int, user_id: int, badge: str) -> None:
 async def get_badges(guild_id: int, user_id: int) -> List[str]:
     if _is_owner_god(user_id):
         return list(GOD_BADGES)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT badge FROM badges WHERE guild_id = ? AND user_id = ? ORDER BY badge ASC",
             (guild_id, user_id),
@@ -787,7 +1562,7 @@ async def upsert_daily_task(
 ) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO daily_tasks (guild_id, user_id, date, task_type, target, progress, claimed) VALUES (?, ?, ?, ?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id, date, task_type) DO UPDATE SET target=excluded.target, progress=excluded.progress, claimed=excluded.claimed",
@@ -796,6 +1571,33 @@ async def upsert_daily_task(
         await db.commit()
 
 
+DEFAULT_DAILY_TASKS: Tuple[Tuple[str, int], ...] = (("messages", 30), ("voice_minutes", 15), ("games", 2))
+_DAILY_ENSURED: Dict[str, Set[Tuple[int, int]]] = {}
+
+
+async def ensure_daily_tasks(guild_id: int, user_id: int, date: str, specs: Sequence[Tuple[str, int]]) -> None:
+    if _is_owner_god(user_id) or not specs:
+        return
+    ensured = _DAILY_ENSURED.get(date)
+    if ensured is None:
+        _DAILY_ENSURED.clear()
+        ensured = set()
+        _DAILY_ENSURED[date] = ensured
+    if (guild_id, user_id) in ensured:
+        return
+    params: List[Any] = []
+    for task_type, target in specs:
+        params.extend((guild_id, user_id, date, task_type, target))
+    values = ", ".join(["(?, ?, ?, ?, ?, 0, 0)"] * len(specs))
+    async with _writer() as db:
+        await db.execute(
+            f"INSERT OR IGNORE INTO daily_tasks (guild_id, user_id, date, task_type, target, progress, claimed) VALUES {values}",
+            tuple(params),
+        )
+        await db.commit()
+    ensured.add((guild_id, user_id))
+
+
 async def get_daily_tasks(guild_id: int, user_id: int, date: str) -> List[Dict[str, Any]]:
     if _is_owner_god(user_id):
         return [
@@ -803,30 +1605,28 @@ async def get_daily_tasks(guild_id: int, user_id: int, date: str) -> List[Dict[s
             {"task_type": "voice_minutes", "target": 1, "progress": 1, "claimed": 1},
             {"task_type": "games", "target": 1, "progress": 1, "claimed": 1},
         ]
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT task_type, target, progress, claimed FROM daily_tasks WHERE guild_id = ? AND user_id = ? AND date = ?",
             (guild_id, user_id, date),
         )
-        return [dict(r) for r in rows]
+    tasks = [dict(r) for r in rows]
+    for task in tasks:
+        task["progress"] = int(task["progress"]) + _COUNTERS.overlay_daily(guild_id, user_id, date, task["task_type"])
+    return tasks
 
 
 async def update_daily_progress(guild_id: int, user_id: int, date: str, task_type: str, delta: int) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE daily_tasks SET progress = progress + ? WHERE guild_id = ? AND user_id = ? AND date = ? AND task_type = ?",
-            (delta, guild_id, user_id, date, task_type),
-        )
-        await db.commit()
+    _COUNTERS.add_daily(guild_id, user_id, date, task_type, delta)
+    _COUNTERS.schedule()
 
 
 async def claim_daily(guild_id: int, user_id: int, date: str) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "UPDATE daily_tasks SET claimed = 1 WHERE guild_id = ? AND user_id = ? AND date = ?",
             (guild_id, user_id, date),
@@ -837,7 +1637,7 @@ async def claim_daily(guild_id: int, user_id: int, date: str) -> None:
 async def add_inventory_item(guild_id: int, user_id: int, item_name: str, count: int = 1) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO fishing_inventory (guild_id, user_id, item_name, count) VALUES (?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id, item_name) DO UPDATE SET count = count + ?",
@@ -849,8 +1649,7 @@ async def add_inventory_item(guild_id: int, user_id: int, item_name: str, count:
 async def get_inventory(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
     if _is_owner_god(user_id):
         return [{"item_name": item_name, "count": GOD_ITEM_COUNT} for item_name in GOD_FISH_ITEMS]
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT item_name, count FROM fishing_inventory WHERE guild_id = ? AND user_id = ? ORDER BY count DESC",
             (guild_id, user_id),
@@ -861,7 +1660,7 @@ async def get_inventory(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
 async def add_pokemon(guild_id: int, user_id: int, pokemon_name: str, count: int = 1) -> None:
     if _is_owner_god(user_id):
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO pokemon_collection (guild_id, user_id, pokemon_name, count) VALUES (?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id, pokemon_name) DO UPDATE SET count = count + ?",
@@ -873,8 +1672,7 @@ async def add_pokemon(guild_id: int, user_id: int, pokemon_name: str, count: int
 async def get_pokemon_collection(guild_id: int, user_id: int) -> List[Dict[str, Any]]:
     if _is_owner_god(user_id):
         return [{"pokemon_name": pokemon_name, "count": GOD_ITEM_COUNT} for pokemon_name in GOD_POKEMON]
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT pokemon_name, count FROM pokemon_collection WHERE guild_id = ? AND user_id = ? ORDER BY count DESC",
             (guild_id, user_id),
@@ -882,74 +1680,95 @@ async def get_pokemon_collection(guild_id: int, user_id: int) -> List[Dict[str,
         return [dict(r) for r in rows]
 
 
-async def create_reminder(user_id: int, guild_id: Optional[int], channel_id: int, message: str, remind_at: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
+async def create_reminder(user_id: int, guild_id: Optional[int], channel_id: int, message: str, remind_at: str) -> int:
+    async with _writer() as db:
+        cursor = await db.execute(
             "INSERT INTO reminders (user_id, guild_id, channel_id, message, remind_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (user_id, guild_id, channel_id, message, remind_at, _utcnow()),
         )
         await db.commit()
+        return cursor.lastrowid
 
 
-async def get_due_reminders(now_iso: str) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        rows = await _fetchall(db, 
-            "SELECT * FROM reminders WHERE remind_at <= ? ORDER BY remind_at ASC",
-            (now_iso,),
-        )
-        return [dict(r) for r in rows]
+async def get_reminder(reminder_id: int) -> Optional[Dict[str, Any]]:
+    async with _reader() as db:
+        row = await _fetchone(db, "SELECT * FROM reminders WHERE id = ?", (reminder_id,))
+        return dict(row) if row else None
+
+
+async def list_reminder_schedule() -> List[Tuple[int, str]]:
+    async with _reader() as db:
+        rows = await _fetchall(db, "SELECT id, remind_at FROM reminders")
+        return [(r["id"], r["remind_at"]) for r in rows]
 
 
 async def delete_reminder(reminder_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute("DELETE FROM reminders WHERE id = ?", (reminder_id,))
         await db.commit()
 
 
+_AFK_CACHE: Dict[int, Dict[int, Dict[str, Any]]] = {}
+_AFK_VERSION = 0
+
+
+async def _afk_entries(guild_id: int) -> Dict[int, Dict[str, Any]]:
+    entries = _AFK_CACHE.get(guild_id)
+    if entries is not None:
+        return entries
+    version = _AFK_VERSION
+    async with _reader() as db:
+        rows = await _fetchall(
+            db,
+            "SELECT guild_id, user_id, reason, since_at FROM afk_status WHERE guild_id = ?",
+            (guild_id,),
+        )
+    entries = {int(row["user_id"]): dict(row) for row in rows}
+    if version == _AFK_VERSION:
+        _AFK_CACHE[guild_id] = entries
+    return entries
+
+
 async def set_afk_status(guild_id: int, user_id: int, reason: str, since_at: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    global _AFK_VERSION
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO afk_status (guild_id, user_id, reason, since_at) VALUES (?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id) DO UPDATE SET reason=excluded.reason, since_at=excluded.since_at",
             (guild_id, user_id, reason, since_at),
         )
         await db.commit()
+        _AFK_VERSION += 1
+        entries = _AFK_CACHE.get(guild_id)
+        if entries is not None:
+            entries[user_id] = {"guild_id": guild_id, "user_id": user_id, "reason": reason, "since_at": since_at}
 
 
 async def get_afk_status(guild_id: int, user_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        row = await _fetchone(
-            db,
-            "SELECT guild_id, user_id, reason, since_at FROM afk_status WHERE guild_id = ? AND user_id = ?",
-            (guild_id, user_id),
-        )
-        return dict(row) if row else None
+    entries = await _afk_entries(guild_id)
+    entry = entries.get(user_id)
+    return dict(entry) if entry else None
 
 
 async def get_afk_statuses(guild_id: int, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
     if not user_ids:
         return {}
-    placeholders = ",".join(["?"] * len(user_ids))
-    params: Tuple[Any, ...] = (guild_id, *user_ids)
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        rows = await _fetchall(
-            db,
-            f"SELECT user_id, reason, since_at FROM afk_status WHERE guild_id = ? AND user_id IN ({placeholders})",
-            params,
-        )
-        return {int(row["user_id"]): dict(row) for row in rows}
+    entries = await _afk_entries(guild_id)
+    return {user_id: dict(entries[user_id]) for user_id in user_ids if user_id in entries}
 
 
 async def clear_afk_status(guild_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
+    global _AFK_VERSION
+    async with _writer() as db:
         cursor = await db.execute(
             "DELETE FROM afk_status WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
         )
         await db.commit()
+        _AFK_VERSION += 1
+        entries = _AFK_CACHE.get(guild_id)
+        if entries is not None:
+            entries.pop(user_id, None)
         return cursor.rowcount > 0
 
 
@@ -961,20 +1780,20 @@ async def upsert_music_cache(
     filepath: str,
     size_bytes: int,
     last_played_at: str,
+    payload: Optional[str] = None,
 ) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
-            "INSERT INTO music_cache (video_id, quality, title, duration, filepath, size_bytes, last_played_at)\n"
-            "VALUES (?, ?, ?, ?, ?, ?, ?)\n"
-            "ON CONFLICT(video_id, quality) DO UPDATE SET title=excluded.title, duration=excluded.duration, filepath=excluded.filepath, size_bytes=excluded.size_bytes, last_played_at=excluded.last_played_at",
-            (video_id, quality, title, duration, filepath, size_bytes, last_played_at),
+            "INSERT INTO music_cache (video_id, quality, title, duration, filepath, size_bytes, last_played_at, payload)\n"
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)\n"
+            "ON CONFLICT(video_id, quality) DO UPDATE SET title=excluded.title, duration=excluded.duration, filepath=excluded.filepath, size_bytes=excluded.size_bytes, last_played_at=excluded.last_played_at, payload=excluded.payload",
+            (video_id, quality, title, duration, filepath, size_bytes, last_played_at, payload),
         )
         await db.commit()
 
 
 async def get_music_cache(video_id: str, quality: str) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT * FROM music_cache WHERE video_id = ? AND quality = ?",
             (video_id, quality),
@@ -983,7 +1802,7 @@ async def get_music_cache(video_id: str, quality: str) -> Optional[Dict[str, Any
 
 
 async def touch_music_cache(video_id: str, quality: str, last_played_at: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "UPDATE music_cache SET last_played_at = ? WHERE video_id = ? AND quality = ?",
             (last_played_at, video_id, quality),
@@ -992,14 +1811,13 @@ async def touch_music_cache(video_id: str, quality: str, last_played_at: str) ->
 
 
 async def list_music_cache() -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, "SELECT * FROM music_cache")
         return [dict(r) for r in rows]
 
 
 async def delete_music_cache(video_id: str, quality: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "DELETE FROM music_cache WHERE video_id = ? AND quality = ?",
             (video_id, quality),
@@ -1007,8 +1825,17 @@ async def delete_music_cache(video_id: str, quality: str) -> None:
         await db.commit()
 
 
+async def prune_music_cache(quality_prefix: str, before: str) -> None:
+    async with _writer() as db:
+        await db.execute(
+            "DELETE FROM music_cache WHERE quality LIKE ? AND last_played_at < ?",
+            (f"{quality_prefix}%", before),
+        )
+        await db.commit()
+
+
 async def create_ticket(guild_id: int, channel_id: int, opener_id: int) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         cursor = await db.execute(
             "INSERT INTO tickets (guild_id, channel_id, opener_id, status, created_at) VALUES (?, ?, ?, 'open', ?)",
             (guild_id, channel_id, opener_id, _utcnow()),
@@ -1018,7 +1845,7 @@ async def create_ticket(guild_id: int, channel_id: int, opener_id: int) -> int:
 
 
 async def close_ticket(channel_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "UPDATE tickets SET status='closed', closed_at=? WHERE channel_id = ?",
             (_utcnow(), channel_id),
@@ -1034,7 +1861,7 @@ async def create_role_menu(
     min_values: int,
     max_values: int,
 ) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT OR REPLACE INTO role_menus (guild_id, message_id, channel_id, title, min_values, max_values) VALUES (?, ?, ?, ?, ?, ?)",
             (guild_id, message_id, channel_id, title, min_values, max_values),
@@ -1043,7 +1870,7 @@ async def create_role_menu(
 
 
 async def add_role_menu_item(message_id: int, role_id: int, label: str, emoji: Optional[str]) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT OR REPLACE INTO role_menu_items (message_id, role_id, label, emoji) VALUES (?, ?, ?, ?)",
             (message_id, role_id, label, emoji),
@@ -1052,8 +1879,7 @@ async def add_role_menu_item(message_id: int, role_id: int, label: str, emoji: O
 
 
 async def get_role_menu(message_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT * FROM role_menus WHERE message_id = ?",
             (message_id,),
@@ -1062,8 +1888,7 @@ async def get_role_menu(message_id: int) -> Optional[Dict[str, Any]]:
 
 
 async def list_role_menu_items(message_id: int) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT role_id, label, emoji FROM role_menu_items WHERE message_id = ?",
             (message_id,),
@@ -1072,8 +1897,7 @@ async def list_role_menu_items(message_id: int) -> List[Dict[str, Any]]:
 
 
 async def list_all_role_menus() -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, "SELECT * FROM role_menus")
         return [dict(r) for r in rows]
 
@@ -1088,7 +1912,7 @@ async def create_poll(
     ends_at: Optional[str],
     created_by: int,
 ) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         cursor = await db.execute(
             "INSERT INTO polls (guild_id, channel_id, message_id, question, options_json, anonymous, ends_at, created_at, created_by) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (guild_id, channel_id, message_id, question, options_json, anonymous, ends_at, _utcnow(), created_by),
@@ -1098,8 +1922,7 @@ async def create_poll(
 
 
 async def get_poll(poll_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT * FROM polls WHERE id = ?",
             (poll_id,),
@@ -1108,8 +1931,7 @@ async def get_poll(poll_id: int) -> Optional[Dict[str, Any]]:
 
 
 async def get_poll_by_message(message_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, 
             "SELECT * FROM polls WHERE message_id = ?",
             (message_id,),
@@ -1117,19 +1939,8 @@ async def get_poll_by_message(message_id: int) -> Optional[Dict[str, Any]]:
         return dict(row) if row else None
 
 
-async def list_due_polls(now_iso: str) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        rows = await _fetchall(db, 
-            "SELECT * FROM polls WHERE ends_at IS NOT NULL AND ends_at <= ?",
-            (now_iso,),
-        )
-        return [dict(r) for r in rows]
-
-
 async def list_open_polls(now_iso: str) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT * FROM polls WHERE ends_at IS NULL OR ends_at > ?",
             (now_iso,),
@@ -1137,15 +1948,21 @@ async def list_open_polls(now_iso: str) -> List[Dict[str, Any]]:
         return [dict(r) for r in rows]
 
 
+async def list_poll_schedule() -> List[Tuple[int, str]]:
+    async with _reader() as db:
+        rows = await _fetchall(db, "SELECT id, ends_at FROM polls WHERE ends_at IS NOT NULL")
+        return [(r["id"], r["ends_at"]) for r in rows]
+
+
 async def delete_poll(poll_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute("DELETE FROM polls WHERE id = ?", (poll_id,))
         await db.execute("DELETE FROM poll_votes WHERE poll_id = ?", (poll_id,))
         await db.commit()
 
 
 async def vote_poll(poll_id: int, user_id: int, option_index: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO poll_votes (poll_id, user_id, option_index) VALUES (?, ?, ?)\n"
             "ON CONFLICT(poll_id, user_id) DO UPDATE SET option_index=excluded.option_index",
@@ -1155,7 +1972,7 @@ async def vote_poll(poll_id: int, user_id: int, option_index: int) -> None:
 
 
 async def get_poll_counts(poll_id: int, option_count: int) -> List[int]:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT option_index, COUNT(*) FROM poll_votes WHERE poll_id = ? GROUP BY option_index",
             (poll_id,),
@@ -1168,7 +1985,7 @@ async def get_poll_counts(poll_id: int, option_count: int) -> List[int]:
 
 
 async def set_birthday(guild_id: int, user_id: int, month: int, day: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO birthdays (guild_id, user_id, month, day) VALUES (?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id) DO UPDATE SET month=excluded.month, day=excluded.day",
@@ -1178,7 +1995,7 @@ async def set_birthday(guild_id: int, user_id: int, month: int, day: int) -> Non
 
 
 async def list_birthdays_for_date(guild_id: int, month: int, day: int) -> List[int]:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT user_id FROM birthdays WHERE guild_id = ? AND month = ? AND day = ?",
             (guild_id, month, day),
@@ -1187,7 +2004,7 @@ async def list_birthdays_for_date(guild_id: int, month: int, day: int) -> List[i
 
 
 async def create_event(guild_id: int, channel_id: int, name: str, event_time: str, created_by: int) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         cursor = await db.execute(
             "INSERT INTO events (guild_id, channel_id, name, event_time, created_by, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (guild_id, channel_id, name, event_time, created_by, _utcnow()),
@@ -1197,8 +2014,7 @@ async def create_event(guild_id: int, channel_id: int, name: str, event_time: st
 
 
 async def list_upcoming_events(guild_id: int, now_iso: str, limit: int = 10) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(db, 
             "SELECT id, channel_id, name, event_time FROM events WHERE guild_id = ? AND event_time >= ? ORDER BY event_time ASC LIMIT ?",
             (guild_id, now_iso, limit),
@@ -1207,13 +2023,13 @@ async def list_upcoming_events(guild_id: int, now_iso: str, limit: int = 10) ->
 
 
 async def delete_event(event_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute("DELETE FROM events WHERE id = ?", (event_id,))
         await db.commit()
 
 
 async def set_verify_code(guild_id: int, user_id: int, code: str, expires_at: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "INSERT INTO verify_codes (guild_id, user_id, code, expires_at, created_at) VALUES (?, ?, ?, ?, ?)\n"
             "ON CONFLICT(guild_id, user_id) DO UPDATE SET code=excluded.code, expires_at=excluded.expires_at, created_at=excluded.created_at",
@@ -1223,8 +2039,7 @@ async def set_verify_code(guild_id: int, user_id: int, code: str, expires_at: st
 
 
 async def get_verify_code(guild_id: int, user_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(
             db,
             "SELECT code, expires_at, created_at FROM verify_codes WHERE guild_id = ? AND user_id = ?",
@@ -1234,7 +2049,7 @@ async def get_verify_code(guild_id: int, user_id: int) -> Optional[Dict[str, Any
 
 
 async def delete_verify_code(guild_id: int, user_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "DELETE FROM verify_codes WHERE guild_id = ? AND user_id = ?",
             (guild_id, user_id),
@@ -1243,7 +2058,7 @@ async def delete_verify_code(guild_id: int, user_id: int) -> None:
 
 
 async def delete_expired_verify_codes(now_iso: str) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "DELETE FROM verify_codes WHERE expires_at <= ?",
             (now_iso,),
@@ -1260,7 +2075,7 @@ async def create_giveaway(
     ends_at: str,
     created_by: int,
 ) -> int:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         cursor = await db.execute(
             "INSERT INTO giveaways (guild_id, channel_id, message_id, prize, winner_count, ends_at, created_by, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
             (guild_id, channel_id, message_id, prize, winner_count, ends_at, created_by, _utcnow()),
@@ -1270,22 +2085,19 @@ async def create_giveaway(
 
 
 async def get_giveaway(giveaway_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, "SELECT * FROM giveaways WHERE id = ?", (giveaway_id,))
         return dict(row) if row else None
 
 
 async def get_giveaway_by_message(message_id: int) -> Optional[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         row = await _fetchone(db, "SELECT * FROM giveaways WHERE message_id = ?", (message_id,))
         return dict(row) if row else None
 
 
 async def list_open_giveaways(now_iso: str) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         rows = await _fetchall(
             db,
             "SELECT * FROM giveaways WHERE ended_at IS NULL AND ends_at > ?",
@@ -1294,20 +2106,15 @@ async def list_open_giveaways(now_iso: str) -> List[Dict[str, Any]]:
         return [dict(r) for r in rows]
 
 
-async def list_due_giveaways(now_iso: str) -> List[Dict[str, Any]]:
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        rows = await _fetchall(
-            db,
-            "SELECT * FROM giveaways WHERE ended_at IS NULL AND ends_at <= ?",
-            (now_iso,),
-        )
-        return [dict(r) for r in rows]
+async def list_giveaway_schedule() -> List[Tuple[int, str]]:
+    async with _reader() as db:
+        rows = await _fetchall(db, "SELECT id, ends_at FROM giveaways WHERE ended_at IS NULL")
+        return [(r["id"], r["ends_at"]) for r in rows]
 
 
 async def close_giveaway(giveaway_id: int, winners: List[int], ended_at: str) -> None:
     winners_json = json.dumps(winners)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "UPDATE giveaways SET ended_at = ?, winners_json = ? WHERE id = ?",
             (ended_at, winners_json, giveaway_id),
@@ -1316,7 +2123,7 @@ async def close_giveaway(giveaway_id: int, winners: List[int], ended_at: str) ->
 
 
 async def add_giveaway_entry(giveaway_id: int, user_id: int) -> bool:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         cursor = await db.execute(
             "INSERT OR IGNORE INTO giveaway_entries (giveaway_id, user_id) VALUES (?, ?)",
             (giveaway_id, user_id),
@@ -1326,7 +2133,7 @@ async def add_giveaway_entry(giveaway_id: int, user_id: int) -> bool:
 
 
 async def list_giveaway_entries(giveaway_id: int) -> List[int]:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _reader() as db:
         rows = await _fetchall(
             db,
             "SELECT user_id FROM giveaway_entries WHERE giveaway_id = ?",
@@ -1336,7 +2143,7 @@ async def list_giveaway_entries(giveaway_id: int) -> List[int]:
 
 
 async def delete_giveaway_entries(giveaway_id: int) -> None:
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             "DELETE FROM giveaway_entries WHERE giveaway_id = ?",
             (giveaway_id,),
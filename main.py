@@ -2,7 +2,6 @@
 
 import logging
 import time
-from collections import defaultdict, deque
 
 import discord
 from discord.ext import commands
@@ -14,9 +13,18 @@ from config import (
     DATA_DIR,
     CACHE_DIR,
 )
-from db import init_db
+from db import init_db, close_db
 from utils.ai_client import AIClient
-from utils.guards import is_owner
+from utils.guards import (
+    is_owner,
+    seed_member_counts,
+    forget_member_counts,
+    track_member_join,
+    track_member_remove,
+)
+from utils.bounded_state import ExpiringMap, SlidingWindow
+from utils.message_pipeline import MessagePipeline
+from utils.scheduler import Scheduler
 
 
 COGS = [
@@ -43,11 +51,14 @@ COGS = [
     "cogs.owner_admin",
 ]
 
+COMMAND_RATE_LIMIT = 3
+COMMAND_RATE_WINDOW = 5.0
+
 
 class RateLimitCommandTree(app_commands.CommandTree):
     def __init__(self, client: commands.Bot) -> None:
         super().__init__(client)
-        self._user_buckets: dict[int, deque[float]] = defaultdict(deque)
+        self._user_buckets: ExpiringMap[SlidingWindow] = ExpiringMap("commands.rate_limit", COMMAND_RATE_WINDOW)
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if interaction.type is discord.InteractionType.autocomplete:
@@ -68,10 +79,8 @@ class RateLimitCommandTree(app_commands.CommandTree):
         if is_owner(user.id):
             return True
         now = time.monotonic()
-        bucket = self._user_buckets[user.id]
-        while bucket and now - bucket[0] > 5.0:
-            bucket.popleft()
-        if len(bucket) >= 3:
+        bucket = self._user_buckets.setdefault(user.id, lambda: SlidingWindow(COMMAND_RATE_LIMIT))
+        if bucket.saturated(now, COMMAND_RATE_WINDOW):
             try:
                 message = "You're using commands too quickly (3 commands/5s). Please wait a moment."
                 if not interaction.response.is_done():
@@ -81,7 +90,7 @@ class RateLimitCommandTree(app_commands.CommandTree):
             except Exception:
                 pass
             return False
-        bucket.append(now)
+        bucket.hit(now)
         return True
 
 
@@ -93,11 +102,14 @@ class TetoBot(commands.Bot):
         intents.voice_states = True
         super().__init__(command_prefix="!", intents=intents, tree_cls=RateLimitCommandTree)
         self.ai_client = AIClient()
+        self.message_pipeline = MessagePipeline()
+        self.scheduler = Scheduler(self.wait_until_ready)
 
     async def setup_hook(self) -> None:
         DATA_DIR.mkdir(parents=True, exist_ok=True)
         CACHE_DIR.mkdir(parents=True, exist_ok=True)
         await init_db()
+        self.scheduler.start()
         for ext in COGS:
             try:
                 await self.load_extension(ext)
@@ -108,6 +120,33 @@ class TetoBot(commands.Bot):
         except Exception as exc:
             logging.exception("Command sync failed: %s", exc)
 
+    async def close(self) -> None:
+        try:
+            await self.scheduler.stop()
+            await super().close()
+        finally:
+            await self.ai_client.close()
+            await close_db()
+
+    async def on_message(self, message: discord.Message) -> None:
+        await self.process_commands(message)
+        await self.message_pipeline.dispatch(message)
+
+    async def on_guild_available(self, guild: discord.Guild) -> None:
+        seed_member_counts(guild)
+
+    async def on_guild_join(self, guild: discord.Guild) -> None:
+        seed_member_counts(guild)
+
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        forget_member_counts(guild.id)
+
+    async def on_member_join(self, member: discord.Member) -> None:
+        track_member_join(member)
+
+    async def on_member_remove(self, member: discord.Member) -> None:
+        track_member_remove(member)
+
     async def on_ready(self) -> None:
         logging.info("Logged in as %s (ID: %s)", self.user, self.user.id if self.user else "unknown")
 
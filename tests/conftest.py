@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def run_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "bot.db")
+
+    def run(coro_fn):
+        async def wrapper():
+            await db.init_db()
+            try:
+                return await coro_fn()
+            finally:
+                await db.close_db()
+
+        return asyncio.run(wrapper())
+
+    return run
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+
+from utils.ai_client import ResponseCache, normalize_prompt
+
+
+def _key(cache: ResponseCache, prompt: str) -> str:
+    return cache.key([{"role": "user", "content": prompt}])
+
+
+def test_normalize_prompt_keeps_symbols():
+    assert normalize_prompt("  What   is\tPython?? ") == "what is python"
+    assert normalize_prompt("What is 2-2 ??") == "what is 2-2"
+    assert normalize_prompt("c++ vs c#") == "c++ vs c#"
+
+
+def test_near_duplicates_share_a_cache_entry(tmp_path):
+    async def scenario():
+        cache = ResponseCache(tmp_path / "ai.db", 60.0, 100)
+        await cache.put(_key(cache, "What is Python?"), "A language.")
+        hits = [await cache.get(_key(cache, prompt)) for prompt in ("what is python", "  WHAT IS   PYTHON!! ")]
+        await cache.close()
+        return hits
+
+    assert asyncio.run(scenario()) == ["A language.", "A language."]
+
+
+def test_different_operators_do_not_collide(tmp_path):
+    async def scenario():
+        cache = ResponseCache(tmp_path / "ai.db", 60.0, 100)
+        await cache.put(_key(cache, "what is 2+2"), "4")
+        await cache.put(_key(cache, "c++ vs c#"), "Different languages.")
+        results = [await cache.get(_key(cache, prompt)) for prompt in ("what is 2*2", "What is 2-2 ??", "c vs c")]
+        await cache.close()
+        return results
+
+    assert asyncio.run(scenario()) == [None, None, None]
+
+
+def test_earlier_turns_are_part_of_the_key(tmp_path):
+    tail = [
+        {"role": "user", "content": "and then?"},
+        {"role": "assistant", "content": "It depends."},
+        {"role": "user", "content": "on what?"},
+    ]
+    cooking = [{"role": "user", "content": "how do I bake bread"}, {"role": "assistant", "content": "Knead it."}] + tail
+    coding = [{"role": "user", "content": "how do I fix this bug"}, {"role": "assistant", "content": "Read the trace."}] + tail
+    cache = ResponseCache(tmp_path / "ai.db", 60.0, 100)
+    assert cache.key(cooking) != cache.key(coding)
+    assert cache.key(cooking) == cache.key([dict(msg) for msg in cooking])
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from utils.ai_client import AIClient
+
+
+class _Stream:
+    def __init__(self, parts, delay):
+        self.parts = list(parts)
+        self.delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.parts:
+            raise StopAsyncIteration
+        await asyncio.sleep(self.delay)
+        content = self.parts.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+    async def close(self):
+        self.closed = True
+
+
+class _Completions:
+    def __init__(self, parts, delay):
+        self.parts = parts
+        self.delay = delay
+        self.calls = 0
+        self.streams = []
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        stream = _Stream(self.parts, self.delay)
+        self.streams.append(stream)
+        return stream
+
+
+async def _noop():
+    pass
+
+
+def _client(parts, delay=0.01):
+    client = AIClient()
+    client.cache = None
+    completions = _Completions(parts, delay)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions), close=_noop)
+    return client, completions
+
+
+HISTORY = [{"role": "user", "content": "sing for me"}]
+
+
+def test_followers_survive_a_cancelled_leader():
+    async def scenario():
+        client, completions = _client(["la ", "la ", "la"])
+
+        async def consume():
+            return "".join([delta async for delta in client.stream(HISTORY, 1, 5)])
+
+        leader = asyncio.create_task(consume())
+        await asyncio.sleep(0.015)
+        follower = asyncio.create_task(consume())
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await follower
+        await client.close()
+        return result, completions.calls, client.coalesced
+
+    assert asyncio.run(scenario()) == ("la la la", 1, 1)
+
+
+def test_slow_consumer_does_not_hold_back_others():
+    async def scenario():
+        client, _ = _client(["a", "b", "c"], delay=0.005)
+
+        async def slow():
+            async for _ in client.stream(HISTORY, 1, 5):
+                await asyncio.sleep(0.2)
+
+        async def fast():
+            return "".join([delta async for delta in client.stream(HISTORY, 2, 5)])
+
+        slow_task = asyncio.create_task(slow())
+        await asyncio.sleep(0)
+        result = await asyncio.wait_for(fast(), timeout=0.1)
+        slow_task.cancel()
+        await client.close()
+        return result
+
+    assert asyncio.run(scenario()) == "abc"
+
+
+def test_guilds_do_not_share_flights():
+    async def scenario():
+        client, completions = _client(["hi"])
+
+        async def consume(guild_id):
+            return "".join([delta async for delta in client.stream(HISTORY, 1, guild_id)])
+
+        results = await asyncio.gather(consume(1), consume(2))
+        await client.close()
+        return results, completions.calls
+
+    assert asyncio.run(scenario()) == (["hi", "hi"], 2)
+
+
+def test_upstream_is_closed_when_the_last_waiter_leaves():
+    async def scenario():
+        client, completions = _client(["one ", "two ", "three ", "four"], delay=0.01)
+        received = []
+
+        async def consume():
+            async for delta in client.stream(HISTORY, 1, 5):
+                received.append(delta)
+
+        waiter = asyncio.create_task(consume())
+        await asyncio.sleep(0.025)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        stream = completions.streams[0]
+        result = (0 < len(received) < 4, stream.closed, len(stream.parts) > 0, client.flights)
+        await client.close()
+        return result
+
+    assert asyncio.run(scenario()) == (True, True, True, {})
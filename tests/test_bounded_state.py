@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import asyncio
+
+from utils.ai_client import AIClient
+from utils.bounded_state import ExpiringMap
+
+
+def test_pinned_entries_survive_expiry_and_eviction():
+    held = {"a"}
+    state: ExpiringMap[str] = ExpiringMap("test.pinned", -1.0, 2, pinned=lambda value: value in held)
+    state.set(1, "a")
+    state.set(2, "b")
+    state.set(3, "c")
+    assert state.get(1) == "a"
+    assert state.get(2) is None
+    held.clear()
+    assert state.get(1) is None
+
+
+def test_idle_guild_slots_expire_but_held_ones_stay():
+    async def scenario():
+        client = AIClient()
+        client.guild_slots.ttl = -1.0
+        async with client._slot(1):
+            client._guild_slot(2)
+            during = set(client.guild_slots.entries)
+        client._guild_slot(3)
+        after = set(client.guild_slots.entries)
+        return during, after
+
+    during, after = asyncio.run(scenario())
+    assert during == {1, 2}
+    assert after == {3}
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import db
+
+HOT_QUERIES = [
+    ("SELECT * FROM warnings WHERE guild_id = ? AND user_id = ? ORDER BY id DESC", (1, 2)),
+    ("DELETE FROM warnings WHERE guild_id = ? AND user_id = ?", (1, 2)),
+    ("SELECT * FROM polls WHERE message_id = ?", (1,)),
+    ("SELECT * FROM giveaways WHERE message_id = ?", (1,)),
+    ("SELECT * FROM giveaways WHERE ended_at IS NULL AND ends_at > ?", ("2024-01-01",)),
+    (
+        "SELECT id, channel_id, name, event_time FROM events WHERE guild_id = ? AND event_time >= ? ORDER BY event_time ASC LIMIT ?",
+        (1, "2024-01-01", 10),
+    ),
+    ("SELECT code, expires_at, created_at FROM verify_codes WHERE guild_id = ? AND user_id = ?", (1, 2)),
+    ("DELETE FROM verify_codes WHERE expires_at <= ?", ("2024-01-01",)),
+    ("UPDATE tickets SET status='closed', closed_at=? WHERE channel_id = ?", ("2024-01-01", 1)),
+    ("SELECT user_id FROM birthdays WHERE guild_id = ? AND month = ? AND day = ?", (1, 2, 3)),
+    ("SELECT user_id, xp, level FROM leveling WHERE guild_id = ? ORDER BY xp DESC", (1,)),
+    (
+        "SELECT xp, level, last_xp_at, message_count, voice_seconds FROM leveling WHERE guild_id = ? AND user_id = ?",
+        (1, 2),
+    ),
+    ("SELECT * FROM economy_ledger WHERE guild_id = ? AND user_id = ? ORDER BY id DESC", (1, 2)),
+    ("SELECT * FROM music_cache WHERE video_id = ? AND quality = ?", ("a", "b")),
+    (
+        "SELECT channel_id, tracks_json, head, current, position, loop_mode FROM music_queues WHERE guild_id = ?",
+        (1,),
+    ),
+]
+
+
+def test_hot_queries_use_indexes(run_db):
+    async def plans():
+        result = {}
+        async with db._reader() as conn:
+            for sql, params in HOT_QUERIES:
+                rows = await db._fetchall(conn, "EXPLAIN QUERY PLAN " + sql, params)
+                result[sql] = [row["detail"] for row in rows]
+        return result
+
+    for sql, details in run_db(plans).items():
+        assert details, sql
+        assert not any(detail.startswith("SCAN") for detail in details), (sql, details)
+        assert not any("TEMP B-TREE" in detail for detail in details), (sql, details)
+
+
+def test_migrations_reach_latest_version(run_db):
+    async def state():
+        async with db._reader() as conn:
+            version = (await db._fetchone(conn, "PRAGMA user_version"))[0]
+            names = {
+                row["name"]
+                for row in await db._fetchall(conn, "SELECT name FROM sqlite_master WHERE type = 'index'")
+            }
+        return version, names
+
+    version, names = run_db(state)
+    assert version == db.SCHEMA_MIGRATIONS[-1][0]
+    assert "idx_reminders_remind_at" not in names
+    assert "idx_polls_ends_at" not in names
+    assert "idx_giveaways_due" in names
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import sqlite3
+
+import db
+
+
+def _ledger_rows(guild_id: int, user_id: int):
+    conn = sqlite3.connect(db.DB_PATH)
+    try:
+        return conn.execute(
+            "SELECT delta, balance, reason, ref FROM economy_ledger WHERE guild_id = ? AND user_id = ? ORDER BY id",
+            (guild_id, user_id),
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def test_ledger_commits_with_the_balance_change(run_db):
+    async def scenario():
+        balance = await db.update_balance(10, 20, 500, "daily")
+        return balance, _ledger_rows(10, 20)
+
+    assert run_db(scenario) == (500, [(500, 500, "daily", None)])
+
+
+def test_failed_purchase_leaves_no_ledger_row(run_db):
+    async def scenario():
+        await db.set_balance(10, 21, 300)
+        assert await db.purchase_item(10, 21, "rose", 200) == 100
+        assert await db.purchase_item(10, 21, "crown", 1000) is None
+        return _ledger_rows(10, 21)
+
+    assert run_db(scenario) == [(300, 300, "set", None), (-200, 100, "purchase", "rose")]
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+import wavelink
+
+from utils.lavalink_pool import NodeBalancer
+
+
+def test_installed_wavelink_has_recovery_internals():
+    async def node_attrs():
+        node = wavelink.Node(uri="http://127.0.0.1:2333", password="unused")
+        try:
+            return hasattr(node, "_players"), hasattr(node, "_destroy_player")
+        finally:
+            await node._session.close()
+
+    assert asyncio.run(node_attrs()) == (True, True)
+    assert hasattr(wavelink.Player, "_dispatch_voice_update")
+    assert hasattr(wavelink.Player, "switch_node")
+
+
+def test_recovery_is_skipped_without_internals(caplog):
+    player = SimpleNamespace(guild=SimpleNamespace(id=1), node=SimpleNamespace(identifier="main"))
+    node = SimpleNamespace(identifier="main", players={})
+
+    async def scenario():
+        balancer = NodeBalancer(nodes=lambda: {})
+        return await balancer.reattach(player), await balancer.prune_stale(node)
+
+    assert asyncio.run(scenario()) == (False, 0)
+    assert "not supported" in caplog.text
+
+
+def test_prune_stale_destroys_unknown_players():
+    destroyed = []
+
+    async def fetch_players():
+        return [SimpleNamespace(guild_id=1), SimpleNamespace(guild_id=2)]
+
+    async def destroy(guild_id):
+        destroyed.append(guild_id)
+
+    node = SimpleNamespace(identifier="main", players={1: object()}, fetch_players=fetch_players, _destroy_player=destroy)
+    pruned = asyncio.run(NodeBalancer(nodes=lambda: {}).prune_stale(node))
+    assert pruned == 1
+    assert destroyed == [2]
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from db import GuildLeaderboard
+
+
+def test_rank_and_page_follow_updates():
+    board = GuildLeaderboard([(1, 100, 2), (2, 50, 1), (3, 75, 1)])
+    assert [entry["user_id"] for entry in board.page(0, 10)] == [1, 3, 2]
+    assert board.rank(2) == 3
+
+    board.add(2, 60)
+    assert board.rank(2) == 1
+    assert board.rank(1) == 2
+    assert board.page(0, 1) == [{"user_id": 2, "xp": 110, "level": 1}]
+
+    board.set(4, 80, 3)
+    assert len(board) == 4
+    assert [entry["user_id"] for entry in board.page(1, 2)] == [1, 4]
+    assert board.rank(5) is None
+
+
+def test_ties_rank_by_user_id():
+    board = GuildLeaderboard([(9, 10, 1), (4, 10, 1)])
+    assert board.rank(4) == 1
+    assert board.rank(9) == 2
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import sqlite3
+
+import db
+
+
+def test_search_payload_lives_in_its_own_column(run_db):
+    async def scenario():
+        await db.upsert_music_cache("lofi", "search:youtube", "lofi", 60, "", 9, "2026-01-01T00:00:00+00:00", payload='{"a":1}')
+        await db.upsert_music_cache("abc", "high", "song", 60, "/cache/abc.opus", 1024, "2026-01-01T00:00:00+00:00")
+        return await db.get_music_cache("lofi", "search:youtube"), await db.get_music_cache("abc", "high")
+
+    search, audio = run_db(scenario)
+    assert (search["filepath"], search["payload"]) == ("", '{"a":1}')
+    assert (audio["filepath"], audio["payload"]) == ("/cache/abc.opus", None)
+
+
+def test_migration_moves_old_search_rows_into_payload(run_db):
+    conn = sqlite3.connect(db.DB_PATH)
+    conn.executescript(
+        "CREATE TABLE music_cache (video_id TEXT NOT NULL, quality TEXT NOT NULL, title TEXT, duration INTEGER,"
+        " filepath TEXT NOT NULL, size_bytes INTEGER NOT NULL, last_played_at TEXT NOT NULL, PRIMARY KEY (video_id, quality));"
+        "INSERT INTO music_cache VALUES ('lofi', 'search:youtube', 'lofi', 60, '{\"a\":1}', 7, '2026-01-01');"
+        "INSERT INTO music_cache VALUES ('abc', 'high', 'song', 60, '/cache/abc.opus', 1024, '2026-01-01');"
+        "PRAGMA user_version = 4;"
+    )
+    conn.close()
+
+    async def scenario():
+        return await db.get_music_cache("lofi", "search:youtube"), await db.get_music_cache("abc", "high")
+
+    search, audio = run_db(scenario)
+    assert (search["filepath"], search["payload"]) == ("", '{"a":1}')
+    assert (audio["filepath"], audio["payload"]) == ("/cache/abc.opus", None)
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import db
+
+
+def test_position_snapshots_survive_a_restart(run_db):
+    async def write():
+        await db.save_music_queue(1, 10, ["a", "b", "c"], 0, None, 0, 0)
+        await db.save_music_queue(1, 10, None, 1, "a", 500, 0)
+        await db.save_music_queue(1, 10, None, 1, "a", 1500, 1)
+
+    async def read():
+        return await db.load_music_queue(1)
+
+    run_db(write)
+    assert run_db(read) == {
+        "channel_id": 10,
+        "tracks": ["b", "c"],
+        "current": "a",
+        "position": 1500,
+        "loop_mode": 1,
+    }
+
+
+def test_full_save_replaces_an_older_snapshot(run_db):
+    async def scenario():
+        await db.save_music_queue(2, 20, ["a", "b"], 0, None, 0, 0)
+        await db.save_music_queue(2, 20, None, 1, "a", 900, 0)
+        await db.save_music_queue(2, 20, ["x", "y"], 0, None, 0, 0)
+
+    async def read():
+        return await db.load_music_queue(2)
+
+    run_db(scenario)
+    state = run_db(read)
+    assert (state["tracks"], state["current"], state["position"]) == (["x", "y"], None, 0)
+
+
+def test_deleted_queue_is_not_resurrected_by_a_snapshot(run_db):
+    async def scenario():
+        await db.save_music_queue(3, 30, None, 0, "x", 0, 0)
+        first = await db.load_music_queue(3)
+        await db.save_music_queue(3, 30, None, 0, "x", 700, 0)
+        await db.delete_music_queue(3)
+        return first
+
+    async def read():
+        return await db.load_music_queue(3)
+
+    first = run_db(scenario)
+    assert first["tracks"] == [] and first["current"] == "x"
+    assert run_db(read) is None
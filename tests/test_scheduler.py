@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from utils.scheduler import Scheduler
+
+
+def test_due_job_waits_for_handler():
+    async def scenario():
+        scheduler = Scheduler()
+        fired = []
+
+        async def handler(key):
+            fired.append(key)
+
+        scheduler.start()
+        scheduler.schedule("reminder", 7, time.time() - 1)
+        await asyncio.sleep(0.05)
+        assert fired == []
+        assert scheduler.pending() == 1
+        scheduler.register("reminder", handler)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return fired, scheduler.pending()
+
+    fired, pending = asyncio.run(scenario())
+    assert fired == [7]
+    assert pending == 0
+
+
+def test_cancelled_parked_job_is_not_released():
+    async def scenario():
+        scheduler = Scheduler()
+        fired = []
+
+        async def handler(key):
+            fired.append(key)
+
+        scheduler.start()
+        scheduler.schedule("poll", 1, time.time() - 1)
+        await asyncio.sleep(0.05)
+        scheduler.cancel("poll", 1)
+        scheduler.register("poll", handler)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        return fired
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_stop_waits_for_running_jobs():
+    async def scenario():
+        scheduler = Scheduler()
+        finished = []
+
+        async def handler(key):
+            await asyncio.sleep(0.05)
+            finished.append(key)
+
+        scheduler.register("giveaway", handler)
+        scheduler.start()
+        scheduler.schedule("giveaway", 3, time.time() - 1)
+        await asyncio.sleep(0.01)
+        assert len(scheduler.running) == 1
+        await scheduler.stop()
+        return finished, scheduler.running
+
+    finished, running = asyncio.run(scenario())
+    assert finished == [3]
+    assert not running
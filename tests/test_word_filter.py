@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import random
+import string
+
+from utils.word_filter import WordMatcher
+
+
+def _brute(blocked, flagged, text):
+    hit = next((word for word in blocked if word in text), None)
+    return hit, any(word in text for word in flagged)
+
+
+def test_overlapping_and_nested_words():
+    matcher = WordMatcher(["bcd", "he"], ["abc", "she"])
+    assert matcher.scan("xxabcdxx") == ("bcd", True)
+    assert matcher.scan("ushers") == ("he", True)
+    assert matcher.scan("nothing here") == ("he", False)
+    assert matcher.scan("clean") == (None, False)
+    assert WordMatcher([], ["nsfw"]).scan("this is nsfw") == (None, True)
+    assert WordMatcher([]).scan("anything") == (None, False)
+
+
+def test_large_word_list_matches_brute_force():
+    rng = random.Random(6)
+    alphabet = string.ascii_lowercase[:6]
+    blocked = {"".join(rng.choices(alphabet, k=rng.randint(4, 9))) for _ in range(5000)}
+    flagged = {"".join(rng.choices(alphabet, k=rng.randint(3, 6))) for _ in range(200)} - blocked
+    matcher = WordMatcher(blocked, flagged)
+    for _ in range(300):
+        text = "".join(rng.choices(alphabet + " ", k=rng.randint(0, 120)))
+        found, flagged_hit = matcher.scan(text)
+        expected, any_flagged = _brute(blocked, flagged, text)
+        assert (found is None) == (expected is None), text
+        if found is not None:
+            assert found in blocked and found in text
+        else:
+            assert flagged_hit == any_flagged, text
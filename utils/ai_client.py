@@ -1,11 +1,35 @@
 ﻿from __future__ import annotations
 
 import asyncio
-from typing import List, Dict
+import hashlib
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from openai import OpenAI
+import aiosqlite
+from openai import AsyncOpenAI
 
-from config import GROQ_API_KEY, GROQ_BASE_URL, GROQ_MODEL
+from config import (
+    GROQ_API_KEY,
+    GROQ_BASE_URL,
+    GROQ_MODEL,
+    CACHE_DIR,
+    AI_MAX_CONCURRENCY,
+    AI_GUILD_CONCURRENCY,
+    AI_TIMEOUT_SECONDS,
+    AI_CACHE_ENABLED,
+    AI_CACHE_TTL_SECONDS,
+    AI_CACHE_MAX_ENTRIES,
+)
+from utils.bounded_state import ExpiringMap
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCT = "?!. "
+_CACHE_KEY_VERSION = 3
 
 TETO_SYSTEM_PROMPT = """
 You are Kasane Teto, a cute tsundere vocal synth character. Stay in character at all times.
@@ -44,35 +68,370 @@ Safety:
 """.strip()
 
 
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 4
+
+
+def trim_history(history: List[Dict[str, str]], max_messages: int, token_budget: int) -> None:
+    if len(history) > max_messages:
+        del history[: len(history) - max_messages]
+    total = sum(estimate_tokens(msg["content"]) for msg in history)
+    while len(history) > 1 and total > token_budget:
+        total -= estimate_tokens(history.pop(0)["content"])
+
+
+def normalize_prompt(text: str) -> str:
+    return _WHITESPACE_RE.sub(" ", text.casefold()).strip().rstrip(_TRAILING_PUNCT)
+
+
+class ResponseCache:
+    def __init__(self, path: Path, ttl: float, max_entries: int) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.memory: ExpiringMap[Tuple[str, float]] = ExpiringMap("ai.response_cache", ttl, max_entries)
+        self.db: Optional[aiosqlite.Connection] = None
+        self.open_lock = asyncio.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def key(self, history: List[Dict[str, str]]) -> str:
+        window = [[msg["role"], normalize_prompt(msg["content"])] for msg in history]
+        payload = json.dumps([_CACHE_KEY_VERSION, GROQ_MODEL, TETO_SYSTEM_PROMPT, window], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _open(self) -> aiosqlite.Connection:
+        if self.db is not None:
+            return self.db
+        async with self.open_lock:
+            if self.db is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                db = await aiosqlite.connect(self.path)
+                await db.execute("PRAGMA journal_mode = WAL")
+                await db.execute("PRAGMA synchronous = NORMAL")
+                await db.execute(
+                    "CREATE TABLE IF NOT EXISTS ai_response_cache (key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                await db.execute("DELETE FROM ai_response_cache WHERE created_at < ?", (time.time() - self.ttl,))
+                await db.commit()
+                self.db = db
+        return self.db
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        cached = self.memory.get(key)
+        if cached is not None and now - cached[1] <= self.ttl:
+            self.hits += 1
+            return cached[0]
+        try:
+            db = await self._open()
+            cursor = await db.execute("SELECT response, created_at FROM ai_response_cache WHERE key = ?", (key,))
+            row = await cursor.fetchone()
+            await cursor.close()
+        except Exception:
+            logging.exception("AI response cache read failed")
+            row = None
+        if row is not None and now - row[1] <= self.ttl:
+            self.memory.set(key, (row[0], row[1]))
+            self.disk_hits += 1
+            return row[0]
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, response: str) -> None:
+        if not response:
+            return
+        now = time.time()
+        self.memory.set(key, (response, now))
+        self.stores += 1
+        try:
+            db = await self._open()
+            await db.execute(
+                "INSERT INTO ai_response_cache (key, response, created_at) VALUES (?, ?, ?)\n"
+                "ON CONFLICT(key) DO UPDATE SET response = excluded.response, created_at = excluded.created_at",
+                (key, response, now),
+            )
+            if self.stores % 100 == 0:
+                await db.execute("DELETE FROM ai_response_cache WHERE created_at < ?", (now - self.ttl,))
+            await db.commit()
+        except Exception:
+            logging.exception("AI response cache write failed")
+
+    async def close(self) -> None:
+        if self.db is not None:
+            db = self.db
+            self.db = None
+            await db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self.memory),
+        }
+
+
+class _Flight:
+    __slots__ = ("parts", "done", "error", "changed", "task", "waiters")
+
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.done = False
+        self.error: Optional[str] = None
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+
+    def _notify(self) -> None:
+        changed = self.changed
+        self.changed = asyncio.Event()
+        changed.set()
+
+    def push(self, delta: str) -> None:
+        self.parts.append(delta)
+        self._notify()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        if self.done:
+            return
+        self.done = True
+        self.error = error
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[str]:
+        idx = 0
+        self.waiters += 1
+        try:
+            while True:
+                while idx < len(self.parts):
+                    yield self.parts[idx]
+                    idx += 1
+                if self.done:
+                    if self.error is not None:
+                        raise RuntimeError(self.error)
+                    return
+                await self.changed.wait()
+        finally:
+            self.waiters -= 1
+            if self.waiters == 0 and not self.done and self.task is not None:
+                self.task.cancel()
+
+
+class _GuildSlot:
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
 class AIClient:
     def __init__(self) -> None:
+        self.semaphore = asyncio.Semaphore(max(1, AI_MAX_CONCURRENCY))
+        self.guild_slots: ExpiringMap[_GuildSlot] = ExpiringMap(
+            "ai.guild_slots", 600.0, pinned=lambda slot: slot.users > 0
+        )
+        self.in_flight = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.flights: Dict[str, _Flight] = {}
+        self.coalesced = 0
+        self.cache: Optional[ResponseCache] = None
+        if AI_CACHE_ENABLED and AI_CACHE_TTL_SECONDS > 0:
+            self.cache = ResponseCache(CACHE_DIR / "ai_cache.db", AI_CACHE_TTL_SECONDS, AI_CACHE_MAX_ENTRIES)
         if not GROQ_API_KEY:
             self.client = None
             return
-        self.client = OpenAI(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL)
+        self.client = AsyncOpenAI(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, timeout=AI_TIMEOUT_SECONDS)
 
     def enabled(self) -> bool:
         return self.client is not None
 
-    async def generate(self, history: List[Dict[str, str]], user_id: int) -> str:
-        if not self.client:
-            raise RuntimeError("Groq client not configured")
+    async def close(self) -> None:
+        tasks = [flight.task for flight in self.flights.values() if flight.task is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self.cache is not None:
+            await self.cache.close()
+        if self.client is not None:
+            await self.client.close()
+
+    def _guild_slot(self, guild_id: Optional[int]) -> Optional[_GuildSlot]:
+        if guild_id is None:
+            return None
+        return self.guild_slots.setdefault(guild_id, lambda: _GuildSlot(max(1, AI_GUILD_CONCURRENCY)))
 
+    @asynccontextmanager
+    async def _slot(self, guild_id: Optional[int]) -> AsyncIterator[None]:
+        guild_slot = self._guild_slot(guild_id)
+        if guild_slot is not None:
+            guild_slot.users += 1
+            try:
+                await self._acquire(guild_slot.semaphore)
+            except BaseException:
+                guild_slot.users -= 1
+                raise
+        try:
+            await self._acquire(self.semaphore)
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+                self.semaphore.release()
+        finally:
+            if guild_slot is not None:
+                guild_slot.users -= 1
+                guild_slot.semaphore.release()
+
+    async def _acquire(self, semaphore: asyncio.Semaphore) -> None:
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=AI_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise RuntimeError("AI is busy, try again shortly") from None
+
+    def _build_messages(self, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
         messages = [{"role": "system", "content": TETO_SYSTEM_PROMPT}]
         for msg in history:
             messages.append({"role": msg["role"], "content": msg["content"]})
+        return messages
 
-        def _call() -> str:
-            response = self.client.chat.completions.create(
+    async def _complete(self, messages: List[Dict[str, str]], guild_id: Optional[int]) -> str:
+        async with self._slot(guild_id):
+            self.requests += 1
+            response = await self.client.chat.completions.create(
                 model=GROQ_MODEL,
                 messages=messages,
                 max_tokens=320,
             )
-            content = response.choices[0].message.content
-            if isinstance(content, list):
-                text = "".join(part.get("text", "") for part in content)
+        content = response.choices[0].message.content
+        if isinstance(content, list):
+            text = "".join(part.get("text", "") for part in content)
+        else:
+            text = content or ""
+        return text.strip()
+
+    def _flight_key(self, messages: List[Dict[str, str]], guild_id: Optional[int]) -> str:
+        payload = json.dumps([GROQ_MODEL, guild_id, messages], separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def generate(self, history: List[Dict[str, str]], user_id: int, guild_id: Optional[int] = None) -> str:
+        parts = [delta async for delta in self._coalesced(history, guild_id, streaming=False)]
+        return "".join(parts).strip()
+
+    async def stream(
+        self, history: List[Dict[str, str]], user_id: int, guild_id: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        async for delta in self._coalesced(history, guild_id, streaming=True):
+            yield delta
+
+    async def _coalesced(
+        self, history: List[Dict[str, str]], guild_id: Optional[int], streaming: bool
+    ) -> AsyncIterator[str]:
+        if not self.client:
+            raise RuntimeError("Groq client not configured")
+        cache_key = self.cache.key(history) if self.cache is not None else None
+        if cache_key is not None:
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        messages = self._build_messages(history)
+        flight_key = self._flight_key(messages, guild_id)
+        flight = self.flights.get(flight_key)
+        if flight is None:
+            flight = _Flight()
+            self.flights[flight_key] = flight
+            flight.task = asyncio.create_task(self._fly(flight_key, flight, messages, guild_id, streaming, cache_key))
+        else:
+            self.coalesced += 1
+        async for delta in flight.follow():
+            yield delta
+
+    async def _fly(
+        self,
+        flight_key: str,
+        flight: _Flight,
+        messages: List[Dict[str, str]],
+        guild_id: Optional[int],
+        streaming: bool,
+        cache_key: Optional[str],
+    ) -> None:
+        try:
+            if streaming:
+                upstream = self._stream_upstream(messages, guild_id)
+                try:
+                    async for delta in upstream:
+                        flight.push(delta)
+                finally:
+                    await upstream.aclose()
             else:
-                text = content or ""
-            return text.strip()
+                try:
+                    text = await asyncio.wait_for(self._complete(messages, guild_id), timeout=AI_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise RuntimeError("AI request timed out") from None
+                flight.push(text)
+            flight.finish()
+            if cache_key is not None:
+                await self.cache.put(cache_key, "".join(flight.parts).strip())
+        except asyncio.CancelledError:
+            flight.finish("AI request cancelled")
+            raise
+        except Exception as exc:
+            flight.finish(str(exc) or "AI request failed")
+        finally:
+            if self.flights.get(flight_key) is flight:
+                del self.flights[flight_key]
+
+    async def _stream_upstream(self, messages: List[Dict[str, str]], guild_id: Optional[int]) -> AsyncIterator[str]:
+        async with self._slot(guild_id):
+            self.requests += 1
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(
+                        model=GROQ_MODEL,
+                        messages=messages,
+                        max_tokens=320,
+                        stream=True,
+                    ),
+                    timeout=AI_TIMEOUT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise RuntimeError("AI request timed out") from None
+            chunks = response.__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=AI_TIMEOUT_SECONDS)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        raise RuntimeError("AI request timed out") from None
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                await response.close()
 
-        return await asyncio.to_thread(_call)
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "guilds": len(self.guild_slots),
+            "coalesced": self.coalesced,
+            "cache": self.cache.stats() if self.cache is not None else None,
+        }
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+from config import STATE_MAX_ENTRIES
+
+V = TypeVar("V")
+
+
+class SlidingWindow:
+    __slots__ = ("times", "pos")
+
+    def __init__(self, limit: int) -> None:
+        self.times = [float("-inf")] * max(1, limit)
+        self.pos = 0
+
+    @property
+    def limit(self) -> int:
+        return len(self.times)
+
+    def hit(self, now: float) -> None:
+        self.times[self.pos] = now
+        self.pos = (self.pos + 1) % len(self.times)
+
+    def saturated(self, now: float, interval: float) -> bool:
+        return now - self.times[self.pos] <= interval
+
+
+class RepeatTracker:
+    __slots__ = ("last", "count")
+
+    def __init__(self) -> None:
+        self.last: Optional[str] = None
+        self.count = 0
+
+    def hit(self, value: str) -> int:
+        if value == self.last:
+            self.count += 1
+        else:
+            self.last = value
+            self.count = 1
+        return self.count
+
+
+class _Entry:
+    __slots__ = ("value", "touched", "weight")
+
+    def __init__(self, value: Any, touched: float, weight: int = 0) -> None:
+        self.value = value
+        self.touched = touched
+        self.weight = weight
+
+
+class ExpiringMap(Generic[V]):
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int = STATE_MAX_ENTRIES,
+        max_weight: int = 0,
+        weigh: Optional[Callable[[V], int]] = None,
+        pinned: Optional[Callable[[V], bool]] = None,
+    ) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.max_weight = max(0, max_weight)
+        self.weigh = weigh
+        self.pinned = pinned
+        self.weight = 0
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+        _REGISTRY[name] = self
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _prune(self, now: float) -> None:
+        entries = self.entries
+        pinned_left = len(entries) if self.pinned is not None else 0
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if now - entry.touched <= self.ttl:
+                break
+            if self.pinned is not None and self.pinned(entry.value):
+                if not pinned_left:
+                    break
+                pinned_left -= 1
+                entry.touched = now
+                entries.move_to_end(key)
+                continue
+            del entries[key]
+            self.weight -= entry.weight
+            self.expirations += 1
+
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        now = time.monotonic()
+        self._prune(now)
+        entry = self.entries.get(key)
+        if entry is None:
+            return default
+        entry.touched = now
+        self.entries.move_to_end(key)
+        return entry.value
+
+    def setdefault(self, key: Hashable, factory: Callable[[], V]) -> V:
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        now = time.monotonic()
+        self._prune(now)
+        weight = self.weigh(value) if self.weigh is not None else 0
+        entry = self.entries.get(key)
+        if entry is None:
+            self.entries[key] = _Entry(value, now, weight)
+        else:
+            self.weight -= entry.weight
+            entry.value = value
+            entry.touched = now
+            entry.weight = weight
+            self.entries.move_to_end(key)
+        self.weight += weight
+        while len(self.entries) > self.max_entries or (
+            self.max_weight and self.weight > self.max_weight and len(self.entries) > 1
+        ):
+            victim = self._oldest_unpinned()
+            if victim is None:
+                break
+            evicted = self.entries.pop(victim)
+            self.weight -= evicted.weight
+            self.evictions += 1
+
+    def _oldest_unpinned(self) -> Optional[Hashable]:
+        for key, entry in self.entries.items():
+            if self.pinned is None or not self.pinned(entry.value):
+                return key
+        return None
+
+    def pop(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return default
+        self.weight -= entry.weight
+        return entry.value
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.weight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        self._prune(time.monotonic())
+        return {
+            "name": self.name,
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "weight": self.weight,
+            "max_weight": self.max_weight,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+_REGISTRY: Dict[str, ExpiringMap] = {}
+
+
+def state_stats() -> List[Dict[str, Any]]:
+    return [state.stats() for state in _REGISTRY.values()]
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import discord
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 from utils.superusers import is_superuser
 
@@ -10,20 +10,58 @@ def is_owner(user_id: int | None) -> bool:
     return is_superuser(user_id)
 
 
-def bot_ratio_exceeded(guild: discord.Guild, config: Dict[str, Any], user_id: Optional[int] = None) -> bool:
+_MEMBER_COUNTS: Dict[int, List[int]] = {}
+
+
+def seed_member_counts(guild: discord.Guild) -> List[int]:
+    members = guild.members
+    bots = sum(1 for m in members if m.bot)
+    counts = [len(members) - bots, bots]
+    _MEMBER_COUNTS[guild.id] = counts
+    return counts
+
+
+def forget_member_counts(guild_id: int) -> None:
+    _MEMBER_COUNTS.pop(guild_id, None)
+
+
+def track_member_join(member: discord.Member) -> None:
+    counts = _MEMBER_COUNTS.get(member.guild.id)
+    if counts is None:
+        seed_member_counts(member.guild)
+        return
+    counts[1 if member.bot else 0] += 1
+
+
+def track_member_remove(member: discord.Member) -> None:
+    counts = _MEMBER_COUNTS.get(member.guild.id)
+    if counts is None:
+        seed_member_counts(member.guild)
+        return
+    index = 1 if member.bot else 0
+    counts[index] = max(0, counts[index] - 1)
+
+
+def member_counts(guild: discord.Guild) -> Tuple[int, int]:
+    counts = _MEMBER_COUNTS.get(guild.id)
+    if counts is None:
+        counts = seed_member_counts(guild)
+    return counts[0], counts[1]
+
+
+def bot_ratio_exceeded(guild: discord.Guild, config: Mapping[str, Any], user_id: Optional[int] = None) -> bool:
     if is_owner(user_id):
         return False
     if not config.get("bot_ratio_guard_enabled"):
         return False
-    humans = sum(1 for m in guild.members if not m.bot)
-    bots = sum(1 for m in guild.members if m.bot)
+    humans, bots = member_counts(guild)
     if humans <= 0:
         return True
     ratio = bots / max(1, humans)
     return ratio > float(config.get("bot_ratio_max") or 0.0)
 
 
-def module_enabled(config: Dict[str, Any], key: str, user_id: Optional[int] = None) -> bool:
+def module_enabled(config: Mapping[str, Any], key: str, user_id: Optional[int] = None) -> bool:
     if bool(config.get(key)):
         return True
     if is_owner(user_id):
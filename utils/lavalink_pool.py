@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional
+
+import wavelink
+
+_MISSING_INTERNALS: set[str] = set()
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    identifier: str
+    uri: str
+    password: str
+
+
+def parse_node_specs(raw: str, default_uri: str, default_password: str) -> List[NodeSpec]:
+    specs: List[NodeSpec] = []
+    seen: set[str] = set()
+    for index, entry in enumerate(part.strip() for part in raw.split(",")):
+        if not entry:
+            continue
+        parts = [part.strip() for part in entry.split("|", 2)]
+        if len(parts) == 1:
+            identifier, uri, password = f"node{index + 1}", parts[0], default_password
+        elif len(parts) == 2:
+            identifier, uri, password = parts[0], parts[1], default_password
+        else:
+            identifier, uri, password = parts
+        if identifier in seen:
+            logging.warning("Ignoring duplicate Lavalink node identifier %s", identifier)
+            continue
+        seen.add(identifier)
+        specs.append(NodeSpec(identifier, uri.rstrip("/"), password or default_password))
+    if not specs:
+        specs.append(NodeSpec("main", default_uri, default_password))
+    return specs
+
+
+class NodeLoad:
+    __slots__ = ("players", "playing", "system_load", "deficit", "nulled", "updated")
+
+    def __init__(self, players: int, playing: int, system_load: float, deficit: int, nulled: int) -> None:
+        self.players = players
+        self.playing = playing
+        self.system_load = system_load
+        self.deficit = deficit
+        self.nulled = nulled
+        self.updated = time.monotonic()
+
+    @classmethod
+    def from_stats(cls, stats: Any) -> "NodeLoad":
+        frames = getattr(stats, "frames", None)
+        return cls(
+            players=stats.players,
+            playing=stats.playing,
+            system_load=stats.cpu.system_load,
+            deficit=max(0, frames.deficit) if frames is not None else 0,
+            nulled=max(0, frames.nulled) if frames is not None else 0,
+        )
+
+
+class PlayerSnapshot:
+    __slots__ = ("track", "position", "paused", "taken_at", "live")
+
+    def __init__(self, track: Any, position: int, paused: bool, live: bool = True) -> None:
+        self.track = track
+        self.position = max(0, position)
+        self.paused = paused
+        self.taken_at = time.monotonic()
+        self.live = live
+
+    def position_now(self) -> int:
+        if self.paused or not self.live:
+            return self.position
+        return self.position + int((time.monotonic() - self.taken_at) * 1000)
+
+    def freeze(self) -> "PlayerSnapshot":
+        return PlayerSnapshot(self.track, self.position_now(), self.paused, live=False)
+
+
+def node_penalty(load: Optional[NodeLoad], local_players: int) -> float:
+    if load is None:
+        return float(local_players)
+    players = max(load.playing, local_players)
+    cpu = 1.05 ** (100 * load.system_load) * 10 - 10
+    deficit = 1.03 ** (500 * load.deficit / 3000) * 600 - 600
+    nulled = (1.03 ** (500 * load.nulled / 3000) * 300 - 300) * 2
+    return players + cpu + deficit + nulled
+
+
+def _internal(owner: Any, name: str) -> Any:
+    value = getattr(owner, name, None)
+    if value is None:
+        label = f"{type(owner).__name__}.{name}"
+        if label not in _MISSING_INTERNALS:
+            _MISSING_INTERNALS.add(label)
+            logging.warning(
+                "wavelink %s has no %s; this wavelink version is not supported for player recovery",
+                wavelink.__version__,
+                label,
+            )
+    return value
+
+
+def _default_nodes() -> Mapping[str, Any]:
+    return wavelink.Pool.nodes
+
+
+class NodeBalancer:
+    def __init__(self, nodes: Callable[[], Mapping[str, Any]] = _default_nodes) -> None:
+        self.nodes = nodes
+        self.loads: Dict[str, NodeLoad] = {}
+        self.migrations = 0
+        self.failed_migrations = 0
+
+    def connected(self) -> List[Any]:
+        status = getattr(wavelink, "NodeStatus", None)
+        wanted = getattr(status, "CONNECTED", None)
+        return [node for node in self.nodes().values() if node.status is wanted]
+
+    def penalty(self, node: Any) -> float:
+        return node_penalty(self.loads.get(node.identifier), len(node.players))
+
+    def best_node(self, exclude: Iterable[str] = ()) -> Optional[Any]:
+        skipped = set(exclude)
+        candidates = [node for node in self.connected() if node.identifier not in skipped]
+        if not candidates:
+            return None
+        return min(candidates, key=self.penalty)
+
+    def forget(self, identifier: str) -> None:
+        self.loads.pop(identifier, None)
+
+    async def refresh(self) -> None:
+        for node in self.connected():
+            try:
+                stats = await node.fetch_stats()
+            except Exception as exc:
+                logging.warning("Failed to fetch Lavalink stats for %s: %s", node.identifier, exc)
+                continue
+            self.loads[node.identifier] = NodeLoad.from_stats(stats)
+
+    async def migrate(self, player: Any, exclude: Iterable[str] = ()) -> Optional[Any]:
+        skipped = set(exclude)
+        skipped.add(player.node.identifier)
+        while True:
+            target = self.best_node(skipped)
+            if target is None:
+                return None
+            try:
+                await player.switch_node(target)
+            except Exception as exc:
+                self.failed_migrations += 1
+                logging.warning("Failed to move player %s to node %s: %s", player.guild.id, target.identifier, exc)
+                skipped.add(target.identifier)
+                continue
+            self.migrations += 1
+            return target
+
+    async def reattach(self, player: Any) -> bool:
+        guild = getattr(player, "guild", None)
+        if guild is None:
+            return False
+        dispatch = _internal(player, "_dispatch_voice_update")
+        players = _internal(player.node, "_players")
+        if dispatch is None or players is None:
+            return False
+        players[guild.id] = player
+        try:
+            await dispatch()
+        except Exception as exc:
+            logging.warning("Failed to reattach player %s to node %s: %s", guild.id, player.node.identifier, exc)
+            return False
+        return bool(getattr(player, "connected", False))
+
+    async def prune_stale(self, node: Any) -> int:
+        destroy = _internal(node, "_destroy_player")
+        if destroy is None:
+            return 0
+        try:
+            remote = await node.fetch_players()
+        except Exception as exc:
+            logging.warning("Failed to list players on node %s: %s", node.identifier, exc)
+            return 0
+        pruned = 0
+        for info in remote:
+            if info.guild_id in node.players:
+                continue
+            try:
+                await destroy(info.guild_id)
+                pruned += 1
+            except Exception as exc:
+                logging.debug("Failed to destroy stale player %s on node %s: %s", info.guild_id, node.identifier, exc)
+        return pruned
+
+    def stats(self) -> List[Dict[str, Any]]:
+        result: List[Dict[str, Any]] = []
+        for node in self.nodes().values():
+            load = self.loads.get(node.identifier)
+            result.append(
+                {
+                    "identifier": node.identifier,
+                    "status": str(getattr(node.status, "name", node.status)),
+                    "players": len(node.players),
+                    "cpu": load.system_load if load else None,
+                    "deficit": load.deficit if load else None,
+                    "penalty": round(self.penalty(node), 2),
+                }
+            )
+        return result
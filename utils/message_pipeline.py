@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
+
+import discord
+
+from db import get_guild_config
+from utils.checks import member_is_moderator
+from utils.guards import is_owner
+
+
+MODERATION_STAGE = 10
+AFK_STAGE = 20
+LEVELING_STAGE = 30
+AI_STAGE = 40
+
+
+class MessageContext:
+    __slots__ = ("message", "guild", "member", "config", "content_lower", "is_owner", "_is_moderator")
+
+    def __init__(self, message: discord.Message, config: Mapping[str, Any]) -> None:
+        self.message = message
+        self.guild: discord.Guild = message.guild
+        author = message.author
+        self.member: Optional[discord.Member] = author if isinstance(author, discord.Member) else self.guild.get_member(author.id)
+        self.config = config
+        self.content_lower = (message.content or "").lower()
+        self.is_owner = is_owner(author.id)
+        self._is_moderator: Optional[bool] = None
+
+    @property
+    def is_moderator(self) -> bool:
+        if self._is_moderator is None:
+            self._is_moderator = self.member is not None and member_is_moderator(self.member, self.config)
+        return self._is_moderator
+
+
+StageHandler = Callable[[MessageContext], Awaitable[Optional[bool]]]
+
+
+class MessagePipeline:
+    def __init__(self) -> None:
+        self.stages: List[Tuple[int, str, StageHandler]] = []
+        self.timings: Dict[str, List[float]] = {}
+
+    def add_stage(self, name: str, order: int, handler: StageHandler) -> None:
+        self.remove_stage(name)
+        self.stages.append((order, name, handler))
+        self.stages.sort(key=lambda stage: stage[0])
+
+    def remove_stage(self, name: str) -> None:
+        self.stages = [stage for stage in self.stages if stage[1] != name]
+
+    def _record(self, name: str, elapsed: float) -> None:
+        entry = self.timings.get(name)
+        if entry is None:
+            entry = [0.0, 0.0, 0.0]
+            self.timings[name] = entry
+        entry[0] += 1
+        entry[1] += elapsed
+        if elapsed > entry[2]:
+            entry[2] = elapsed
+
+    async def dispatch(self, message: discord.Message) -> None:
+        if not self.stages or message.guild is None or message.author.bot:
+            return
+        started = time.perf_counter()
+        config = await get_guild_config(message.guild.id)
+        ctx = MessageContext(message, config)
+        for _, name, handler in list(self.stages):
+            stage_started = time.perf_counter()
+            try:
+                stop = await handler(ctx)
+            except Exception:
+                logging.exception("Message stage %s failed", name)
+                stop = False
+            self._record(name, time.perf_counter() - stage_started)
+            if stop:
+                break
+        self._record("total", time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        result: Dict[str, Dict[str, float]] = {}
+        for name, (count, total, worst) in self.timings.items():
+            result[name] = {
+                "count": int(count),
+                "avg_ms": (total / count) * 1000 if count else 0.0,
+                "max_ms": worst * 1000,
+            }
+        return result
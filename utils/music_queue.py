@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import inspect
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional
+
+import wavelink
+
+
+class QueueAdapter:
+    __slots__ = ("queue", "_put", "_bulk", "_get", "_sized", "empty_type")
+
+    def __init__(self, queue: Any) -> None:
+        self.queue = queue
+        self._put = getattr(queue, "put", None) or getattr(queue, "put_nowait", None)
+        self._bulk = self._put is not None and hasattr(queue, "put_wait")
+        self._get = getattr(queue, "get", None)
+        self._sized = hasattr(type(queue), "__len__")
+        self.empty_type = getattr(getattr(wavelink, "exceptions", None), "QueueEmpty", None)
+
+    def __len__(self) -> int:
+        if self.queue is None:
+            return 0
+        if self._sized:
+            return len(self.queue)
+        count = getattr(self.queue, "count", None)
+        return count if isinstance(count, int) else 0
+
+    def __iter__(self) -> Iterator[wavelink.Playable]:
+        if self.queue is None:
+            return iter(())
+        try:
+            return iter(self.queue)
+        except TypeError:
+            return iter(getattr(self.queue, "_queue", ()))
+
+    def put(self, track: wavelink.Playable) -> None:
+        if self._put is not None:
+            self._put(track)
+
+    def extend(self, tracks: List[wavelink.Playable]) -> int:
+        if self._put is None or not tracks:
+            return 0
+        if self._bulk:
+            return self._put(tracks)
+        for track in tracks:
+            self._put(track)
+        return len(tracks)
+
+    async def get(self) -> Optional[wavelink.Playable]:
+        if self._get is None:
+            return None
+        try:
+            result = self._get()
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception:
+            return None
+        return result
+
+    def head(self) -> Optional[wavelink.Playable]:
+        if not len(self):
+            return None
+        return next(iter(self), None)
+
+    def drop_head(self) -> None:
+        if len(self):
+            del self.queue[0]
+
+    def window(self, start: int, count: int) -> List[wavelink.Playable]:
+        return list(islice(self, start, start + count))
+
+    def encoded(self) -> List[str]:
+        return [track.encoded for track in self if getattr(track, "encoded", None)]
+
+    def clear(self) -> bool:
+        clearer = getattr(self.queue, "clear", None)
+        if clearer is None:
+            return False
+        clearer()
+        return True
+
+
+def extend_limited(adapter: QueueAdapter, tracks: Iterable[wavelink.Playable], limit: int) -> int:
+    if limit <= 0:
+        return 0
+    return adapter.extend(list(islice(tracks, limit)))
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional
+
+
+class PlayerRecord:
+    __slots__ = (
+        "guild_id",
+        "channel_id",
+        "node",
+        "connected_at",
+        "idle_since",
+        "idle_reason",
+        "listeners",
+        "tracks_started",
+    )
+
+    def __init__(self, guild_id: int, channel_id: Optional[int], node: Optional[str]) -> None:
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.node = node
+        self.connected_at = time.monotonic()
+        self.idle_since: Optional[float] = None
+        self.idle_reason: Optional[str] = None
+        self.listeners = 0
+        self.tracks_started = 0
+
+    def uptime(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.monotonic()) - self.connected_at
+
+    def idle_for(self, now: Optional[float] = None) -> float:
+        if self.idle_since is None:
+            return 0.0
+        return (now if now is not None else time.monotonic()) - self.idle_since
+
+    def observe(self, reason: Optional[str], listeners: int, now: Optional[float] = None) -> float:
+        now = now if now is not None else time.monotonic()
+        self.listeners = listeners
+        if reason is None:
+            self.idle_since = None
+        elif self.idle_since is None:
+            self.idle_since = now
+        self.idle_reason = reason
+        return self.idle_for(now)
+
+
+class PlayerRegistry:
+    def __init__(self) -> None:
+        self.records: Dict[int, PlayerRecord] = {}
+        self.connected_total = 0
+        self.reaped = 0
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, guild_id: object) -> bool:
+        return guild_id in self.records
+
+    def get(self, guild_id: int) -> Optional[PlayerRecord]:
+        return self.records.get(guild_id)
+
+    def guild_ids(self) -> set[int]:
+        return set(self.records)
+
+    def register(self, guild_id: int, channel_id: Optional[int], node: Optional[str]) -> PlayerRecord:
+        record = self.records.get(guild_id)
+        if record is None:
+            record = PlayerRecord(guild_id, channel_id, node)
+            self.records[guild_id] = record
+            self.connected_total += 1
+        else:
+            record.channel_id = channel_id
+            record.node = node
+        return record
+
+    def unregister(self, guild_id: int, reaped: bool = False) -> Optional[PlayerRecord]:
+        record = self.records.pop(guild_id, None)
+        if record is not None and reaped:
+            self.reaped += 1
+        return record
+
+    def track_started(self, guild_id: int) -> None:
+        record = self.records.get(guild_id)
+        if record is None:
+            return
+        record.tracks_started += 1
+        if record.idle_reason == "empty":
+            record.idle_since = None
+            record.idle_reason = None
+
+    def uptime(self, guild_id: int) -> Optional[float]:
+        record = self.records.get(guild_id)
+        return record.uptime() if record is not None else None
+
+    def counts(self) -> Dict[str, int]:
+        idle = sum(1 for record in self.records.values() if record.idle_since is not None)
+        return {
+            "active": len(self.records),
+            "busy": len(self.records) - idle,
+            "idle": idle,
+            "listeners": sum(record.listeners for record in self.records.values()),
+        }
+
+    def by_node(self) -> Dict[str, int]:
+        result: Dict[str, int] = {}
+        for record in self.records.values():
+            name = record.node or "unknown"
+            result[name] = result.get(name, 0) + 1
+        return result
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "guild_id": record.guild_id,
+                "channel_id": record.channel_id,
+                "node": record.node,
+                "uptime": record.uptime(now),
+                "idle_for": record.idle_for(now),
+                "idle_reason": record.idle_reason,
+                "listeners": record.listeners,
+                "tracks_started": record.tracks_started,
+            }
+            for record in self.records.values()
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        uptimes = [record.uptime(now) for record in self.records.values()]
+        return {
+            **self.counts(),
+            "connected_total": self.connected_total,
+            "reaped": self.reaped,
+            "longest_uptime": max(uptimes) if uptimes else 0.0,
+            "player_seconds": sum(uptimes),
+            "nodes": self.by_node(),
+        }
+
+
+PLAYERS = PlayerRegistry()
+
+
+def active_players() -> List[Dict[str, Any]]:
+    return PLAYERS.snapshot()
+
+
+def player_stats() -> Dict[str, Any]:
+    return PLAYERS.stats()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import wavelink
+
+from db import get_music_cache, prune_music_cache, upsert_music_cache
+from utils.bounded_state import ExpiringMap
+
+SEARCH_QUALITY_PREFIX = "search:"
+WHITESPACE_RE = re.compile(r"\s+")
+
+SearchResult = Tuple[Optional[wavelink.Playlist], List[wavelink.Playable]]
+SearchHit = Tuple[Any, Optional[wavelink.Playlist], List[wavelink.Playable]]
+
+
+def normalize_search_query(query: str, is_url: bool) -> str:
+    collapsed = WHITESPACE_RE.sub(" ", query.strip())
+    return collapsed if is_url else collapsed.casefold()
+
+
+def source_name(source: object | None) -> str:
+    if source is None:
+        return "default"
+    return str(getattr(source, "value", source))
+
+
+def _dump_result(playlist: Optional[wavelink.Playlist], tracks: List[wavelink.Playable]) -> Optional[str]:
+    raws: List[Dict[str, Any]] = []
+    for track in tracks:
+        raw = getattr(track, "raw_data", None)
+        if not isinstance(raw, dict):
+            return None
+        raws.append(raw)
+    payload: Dict[str, Any] = {"tracks": raws}
+    if playlist is not None:
+        plugin = {
+            "type": getattr(playlist, "type", None),
+            "url": getattr(playlist, "url", None),
+            "artworkUrl": getattr(playlist, "artwork", None),
+            "author": getattr(playlist, "author", None),
+        }
+        payload["playlist"] = {
+            "name": playlist.name,
+            "selectedTrack": getattr(playlist, "selected", -1),
+            "pluginInfo": {key: value for key, value in plugin.items() if value is not None},
+        }
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def _load_result(payload: str) -> SearchResult:
+    data = json.loads(payload)
+    raws = data["tracks"]
+    info = data.get("playlist")
+    if info is None:
+        return None, [wavelink.Playable(raw) for raw in raws]
+    playlist = wavelink.Playlist(
+        {
+            "info": {"name": info["name"], "selectedTrack": info["selectedTrack"]},
+            "pluginInfo": info["pluginInfo"],
+            "tracks": raws,
+        }
+    )
+    return playlist, list(playlist.tracks)
+
+
+class SearchCache:
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int) -> None:
+        self.ttl = ttl
+        self.memory: ExpiringMap[Tuple[str, float]] = ExpiringMap(
+            "music.search_cache",
+            ttl,
+            max_entries,
+            max_weight=max_bytes,
+            weigh=lambda value: len(value[0]),
+        )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    async def prune(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.ttl)
+        try:
+            await prune_music_cache(SEARCH_QUALITY_PREFIX, cutoff.isoformat())
+        except Exception:
+            logging.exception("Music search cache prune failed")
+
+    async def get(self, query: str, source: object | None) -> Optional[SearchResult]:
+        name = source_name(source)
+        key = (query, name)
+        now = time.time()
+        cached = self.memory.get(key)
+        payload: Optional[str] = None
+        if cached is not None and now - cached[1] <= self.ttl:
+            payload = cached[0]
+            self.hits += 1
+        else:
+            try:
+                row = await get_music_cache(query, SEARCH_QUALITY_PREFIX + name)
+            except Exception:
+                logging.exception("Music search cache read failed")
+                row = None
+            if row is not None:
+                created = datetime.fromisoformat(row["last_played_at"]).timestamp()
+                if now - created <= self.ttl and row["payload"] is not None:
+                    payload = row["payload"]
+                    self.memory.set(key, (payload, created))
+                    self.disk_hits += 1
+        if payload is None:
+            self.misses += 1
+            return None
+        try:
+            return _load_result(payload)
+        except Exception:
+            logging.exception("Discarding unreadable music search cache entry for %r", query)
+            self.memory.pop(key)
+            return None
+
+    async def put(
+        self,
+        query: str,
+        source: object | None,
+        playlist: Optional[wavelink.Playlist],
+        tracks: List[wavelink.Playable],
+    ) -> None:
+        if not tracks or (playlist is None and getattr(tracks[0], "is_stream", False)):
+            return
+        payload = _dump_result(playlist, tracks)
+        if payload is None:
+            return
+        name = source_name(source)
+        now = datetime.now(timezone.utc)
+        self.memory.set((query, name), (payload, now.timestamp()))
+        self.stores += 1
+        try:
+            await upsert_music_cache(
+                query,
+                SEARCH_QUALITY_PREFIX + name,
+                playlist.name if playlist is not None else tracks[0].title,
+                sum(getattr(track, "length", 0) or 0 for track in tracks),
+                "",
+                len(payload),
+                now.isoformat(),
+                payload=payload,
+            )
+        except Exception:
+            logging.exception("Music search cache write failed")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "bytes": self.memory.weight,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
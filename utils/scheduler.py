@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+MAX_SLEEP_SECONDS = 300.0
+STOP_TIMEOUT_SECONDS = 10.0
+
+JobHandler = Callable[[Any], Awaitable[None]]
+
+
+def _to_timestamp(due: datetime | str | float) -> float:
+    if isinstance(due, str):
+        due = datetime.fromisoformat(due)
+    if isinstance(due, datetime):
+        return due.timestamp()
+    return float(due)
+
+
+class Scheduler:
+    def __init__(self, wait_ready: Optional[Callable[[], Awaitable[Any]]] = None) -> None:
+        self.wait_ready = wait_ready
+        self.heap: List[Tuple[float, int, str, Hashable]] = []
+        self.due: Dict[Tuple[str, Hashable], float] = {}
+        self.handlers: Dict[str, JobHandler] = {}
+        self.parked: Dict[str, Dict[Hashable, float]] = {}
+        self.running: set[asyncio.Task] = set()
+        self.counter = 0
+        self.fired = 0
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self.handlers[kind] = handler
+        parked = self.parked.pop(kind, {})
+        if parked:
+            logging.info("Releasing %s parked %s jobs", len(parked), kind)
+        for key, when in parked.items():
+            if (kind, key) not in self.due:
+                self.schedule(kind, key, when)
+        self.wakeup.set()
+
+    def unregister(self, kind: str) -> None:
+        self.handlers.pop(kind, None)
+        self.parked.pop(kind, None)
+        for entry in [entry for entry in self.due if entry[0] == kind]:
+            self.due.pop(entry, None)
+
+    def schedule(self, kind: str, key: Hashable, due: datetime | str | float) -> None:
+        try:
+            when = _to_timestamp(due)
+        except Exception:
+            logging.warning("Ignoring %s job %s with invalid due time %r", kind, key, due)
+            return
+        self.counter += 1
+        self.due[(kind, key)] = when
+        heapq.heappush(self.heap, (when, self.counter, kind, key))
+        if self.heap[0][1] == self.counter:
+            self.wakeup.set()
+
+    def cancel(self, kind: str, key: Hashable) -> None:
+        self.due.pop((kind, key), None)
+        self.parked.get(kind, {}).pop(key, None)
+
+    def pending(self) -> int:
+        return len(self.due) + sum(len(jobs) for jobs in self.parked.values())
+
+    def next_due(self) -> Optional[float]:
+        self._drop_stale()
+        return self.heap[0][0] if self.heap else None
+
+    def _drop_stale(self) -> None:
+        while self.heap:
+            when, _, kind, key = self.heap[0]
+            if self.due.get((kind, key)) == when:
+                return
+            heapq.heappop(self.heap)
+
+    def start(self) -> None:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task = self.task
+        self.task = None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        running = set(self.running)
+        if not running:
+            return
+        _, unfinished = await asyncio.wait(running, timeout=STOP_TIMEOUT_SECONDS)
+        for job in unfinished:
+            job.cancel()
+        if unfinished:
+            logging.warning("Cancelled %s scheduled jobs still running at shutdown", len(unfinished))
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def _run(self) -> None:
+        if self.wait_ready is not None:
+            await self.wait_ready()
+        while True:
+            self.wakeup.clear()
+            self._drop_stale()
+            if not self.heap:
+                await self.wakeup.wait()
+                continue
+            when, _, kind, key = self.heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self.heap)
+            self.due.pop((kind, key), None)
+            handler = self.handlers.get(kind)
+            if handler is None:
+                logging.warning("No handler registered for due %s job %s; holding it until one is", kind, key)
+                self.parked.setdefault(kind, {})[key] = when
+                continue
+            self.fired += 1
+            job = asyncio.create_task(self._fire(kind, key, handler))
+            self.running.add(job)
+            job.add_done_callback(self.running.discard)
+
+    async def _fire(self, kind: str, key: Hashable, handler: JobHandler) -> None:
+        try:
+            await handler(key)
+        except Exception:
+            logging.exception("Scheduled %s job %s failed", kind, key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending(),
+            "parked": sum(len(jobs) for jobs in self.parked.values()),
+            "running": len(self.running),
+            "fired": self.fired,
+            "next_due": self.next_due(),
+        }
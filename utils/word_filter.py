@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class WordMatcher:
+    __slots__ = ("blocked", "flagged", "goto", "fail", "hit_blocked", "hit_flagged")
+
+    def __init__(self, blocked: Iterable[str], flagged: Iterable[str] = ()) -> None:
+        self.blocked = frozenset(word.lower() for word in blocked if word)
+        self.flagged = frozenset(word.lower() for word in flagged if word) - self.blocked
+        self.goto: List[Dict[str, int]] = [{}]
+        self.hit_blocked: List[Optional[str]] = [None]
+        self.hit_flagged: List[bool] = [False]
+        for word in self.blocked:
+            self.hit_blocked[self._insert(word)] = word
+        for word in self.flagged:
+            self.hit_flagged[self._insert(word)] = True
+        self.fail: List[int] = [0] * len(self.goto)
+        self._link()
+
+    def _insert(self, word: str) -> int:
+        state = 0
+        for ch in word:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.hit_blocked.append(None)
+                self.hit_flagged.append(False)
+            state = nxt
+        return state
+
+    def _link(self) -> None:
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self.goto[state].items():
+                pending.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                link = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = link if link != nxt else 0
+                if self.hit_blocked[nxt] is None:
+                    self.hit_blocked[nxt] = self.hit_blocked[self.fail[nxt]]
+                self.hit_flagged[nxt] = self.hit_flagged[nxt] or self.hit_flagged[self.fail[nxt]]
+
+    def scan(self, content_lower: str) -> Tuple[Optional[str], bool]:
+        if len(self.goto) == 1:
+            return None, False
+        goto, fail = self.goto, self.fail
+        flagged_hit = False
+        state = 0
+        for ch in content_lower:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not state:
+                continue
+            if self.hit_flagged[state]:
+                flagged_hit = True
+                if not self.blocked:
+                    break
+            word = self.hit_blocked[state]
+            if word is not None:
+                return word, flagged_hit
+        return None, flagged_hit